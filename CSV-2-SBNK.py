@@ -1,189 +1,197 @@
 import sys
 import os
+import io
 import csv
+import glob
+import argparse
+import contextlib
+import concurrent.futures
+import json
+import logging
+import hashlib
+import time
+import re
 import traceback
 import struct
-import wave
+import importlib.util
 import math
-import ndspy.soundBank
-from ndspy.soundBank import Instrument, NoteDefinition, NoteType
+import shutil
+import collections
+import datetime
+from wav_io import WavFile, is_pcm16_mono, is_supported, sanitize_loop, to_mono16
+from nds_envelope import SF2_RELEASE_SCALAR, sf2_envelope
+
+try:
+    import resource  # Unix only, used for max RSS in build reports
+except ImportError:
+    resource = None
+
+# Progress output. Per-item lines (instruments, loop points) are DEBUG,
+# milestones INFO; see configure_logging for the defaults per run mode.
+log = logging.getLogger("csv2sbnk")
 
 # ==========================================
 # CONFIGURATION
 # ==========================================
 WAVE_ARCHIVE_IDS = [0, 1, 2, 3] 
 
+# Skip outputs whose inputs (CSV rows, WAVs, settings, converter code) are
+# unchanged since the last build, and reuse cached WAV metadata.
+# Fingerprints are kept in <sbnk name>.build.json
+BUILD_CACHE = True
+BUILD_MANIFEST_SUFFIX = ".build.json"
+
+# Threads used to read and hash WAVs while building the SF2
+SAMPLE_LOAD_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+# Cache the WaveID -> WAV index as Samples.index.json next to the CSV,
+# revalidated against the Samples folder's mtime on the next run
+PERSIST_SAMPLE_INDEX = False
+SAMPLE_INDEX_FILENAME = "Samples.index.json"
+
+# Sound RAM budget (--sizes / --budget): SWAV encoding assumed for the
+# estimates (WAV-2-SWAV's default), and the resampled copy of the bank's
+# waves, in <sbnk name>-Samples-fit/ so banks sharing a Samples folder
+# (and batch workers building them) never write to the same one
+BUDGET_FORMAT = 'adpcm'
+BUDGET_SAMPLES_DIR_SUFFIX = "-Samples-fit"
+
+# Watch mode (--watch): poll interval, and the memory cap for the
+# in-memory cache of loaded samples (PCM) kept between rebuilds
+WATCH_INTERVAL = 0.5
+SAMPLE_CACHE_MB = 256
+
+# Outputs built by default; pick a subset with --targets. The SBNK (and
+# --sdat) need NDSpy, which is only imported when they are built
+OUTPUT_TARGETS = ('sbnk', 'sf2')
+
+# Preview renders (--preview) go to <sbnk name>-preview/, with an index of
+# file digests so two renders can be diffed
+PREVIEW_DIR_SUFFIX = "-preview"
+PREVIEW_INDEX_FILENAME = "previews.json"
+
 # ==========================================
 # TUNING CONSTANTS
 # ==========================================
-# Release: NDS (Linear) -> SF2 (Exponential) requires stretching (~3.1x)
-# Decay: Kept 1:1 to preserve punchiness of attack transients
-SF2_RELEASE_SCALAR = 1.8
+# SF2_RELEASE_SCALAR and the hardware ADSR tables live in nds_envelope.py,
+# shared with NDS-Envelope-Editor.html
 
 # ==========================================
-# TABLES & CONVERSIONS
+# SF2 FILE GENERATION
 # ==========================================
 
-ATTACK_TABLE = [
-    8606.1, 4756.3, 3339.3, 2594.4, 2130.7, 1807.7, 1573.3, 1401.4,
-    1255.5, 1140.9, 1047.1, 963.8, 896.0, 838.7, 786.6, 745.0,
-    703.3, 666.8, 630.4, 599.1, 578.3, 547.0, 526.2, 505.3,
-    484.5, 468.9, 448.0, 437.6, 416.8, 406.4, 395.9, 385.5,
-    369.9, 359.5, 349.0, 338.6, 328.2, 323.0, 312.6, 307.4,
-    297.0, 291.7, 286.5, 276.1, 270.9, 265.7, 260.5, 255.3,
-    250.1, 244.9, 239.6, 234.4, 229.2, 224.0, 218.8, 213.6,
-    213.6, 208.4, 203.2, 203.2, 198.0, 198.0, 192.8, 192.8,
-    182.3, 182.3, 177.1, 177.1, 171.9, 171.9, 166.7, 166.7,
-    161.5, 161.5, 156.3, 156.3, 151.1, 151.1, 145.9, 145.9,
-    145.9, 145.9, 140.7, 140.7, 140.7, 130.2, 130.2, 130.2,
-    125.0, 125.0, 125.0, 125.0, 119.8, 119.8, 119.8, 114.6,
-    114.6, 114.6, 114.6, 109.4, 109.4, 109.4, 109.4, 109.4,
-    104.2, 104.2, 104.2, 104.2, 99.0, 93.8, 88.6, 83.4,
-    78.2, 72.9, 67.7, 62.5, 57.3, 52.1, 46.9, 41.7,
-    36.5, 31.3, 26.1, 20.8, 15.6, 10.4, 10.4, 0.0
-]
-
-MAX_DR_TABLE = [
-    481228.8, 160409.6, 96241.6, 68744.0, 53466.4, 43747.6, 37013.6, 32078.8,
-    28303.6, 25324.0, 22911.2, 20919.6, 19245.2, 17820.4, 16593.2, 15522.0,
-    14580.8, 13748.8, 13005.2, 12334.4, 11736.4, 11190.4, 10691.2, 10238.8,
-    9817.6, 9432.8, 9079.2, 8746.4, 8439.6, 8153.6, 7888.4, 7633.6,
-    7399.6, 7181.2, 6973.2, 6775.6, 6588.4, 6411.6, 6245.2, 6089.2,
-    5938.4, 5792.8, 5657.6, 5527.6, 5402.8, 5283.2, 5174.0, 5064.8,
-    4960.8, 4856.8, 4758.0, 4695.6, 4633.2, 4570.8, 4508.4, 4446.0,
-    4383.6, 4321.2, 4258.8, 4196.4, 4134.0, 4071.6, 4009.2, 3946.8,
-    3884.4, 3822.0, 3759.6, 3692.0, 3629.6, 3567.2, 3504.8, 3442.4,
-    3380.0, 3317.6, 3255.2, 3192.8, 3130.4, 3068.0, 3005.6, 2943.2,
-    2880.8, 2818.4, 2756.0, 2693.6, 2631.2, 2568.8, 2506.4, 2438.8,
-    2376.4, 2314.0, 2251.6, 2189.2, 2126.8, 2064.4, 2002.0, 1939.6,
-    1877.2, 1814.8, 1752.4, 1690.0, 1627.6, 1565.2, 1502.8, 1440.4,
-    1378.0, 1315.6, 1253.2, 1185.6, 1123.2, 1060.8, 998.4, 936.0,
-    873.6, 811.2, 748.8, 686.4, 624.0, 561.6, 499.2, 436.8,
-    374.4, 312.0, 249.6, 187.2, 124.8, 62.4, 31.2, 5.2
-]
-
-def get_sustain_linear(val):
-    return (val / 127.0) ** 2
-
-def get_attack_ms(val):
-    return 0.0 if val >= 127 else ATTACK_TABLE[val]
-
-def get_decay_time_hw(decay_val, sustain_val):
-    if decay_val >= 127: return 0.0
-    max_time = MAX_DR_TABLE[decay_val]
-    sus_frac = get_sustain_linear(sustain_val)
-    return max_time * (1.0 - sus_frac)
-
-def get_release_time_hw(release_val, sustain_val):
-    if release_val >= 127: return 0.0
-    max_time = MAX_DR_TABLE[release_val]
-    sus_frac = get_sustain_linear(sustain_val)
-    return max_time * sus_frac
-
-def get_sustain_db_sf2(val):
-    if val >= 127: return 0
-    if val == 0: return 1440
-    fraction = (val / 127.0) ** 2
-    if fraction > 0:
-        attenuation = -20 * math.log10(fraction)
-    else:
-        attenuation = 144.0
-    return int(min(max(attenuation * 10, 0), 1440))
+def numpy_available():
+    """NumPy is only needed to convert non 16-bit mono WAVs (see wav_io.to_mono16)."""
+    global _numpy_available
+    if _numpy_available is None:
+        _numpy_available = importlib.util.find_spec('numpy') is not None
+    return _numpy_available
+_numpy_available = None
 
-def ms_to_timecents(ms):
-    if ms <= 0: return -12000
-    seconds = ms / 1000.0
-    timecents = int(1200 * math.log2(seconds))
-    return max(-12000, min(timecents, 8000))
+def read_wav_sample(wav_path, name):
+    """
+    Reads format, loop points and a content digest of a WAV. PCM stays on disk:
+    16-bit mono is copied as is, other layouts are converted while writing.
+    """
+    try:
+        loop_start = 0
+        loop_end = 0
+        found_loop = False
+        
+        # Single pass over the mapped file: format, PCM location and 'smpl' loop points
+        with WavFile(wav_path) as wav:
+            native = is_pcm16_mono(wav)
+            if not native and not is_supported(wav):
+                log.warning(f"     [Warning] {name}: unsupported format ({wav.bits_per_sample}-bit, "
+                            f"format 0x{wav.format_tag:04X}), skipping")
+                return None
+            if not native and not numpy_available():
+                log.warning(f"     [Warning] {name}: {wav.bits_per_sample}-bit/{wav.channels} ch needs NumPy "
+                            f"(pip install numpy), skipping")
+                return None
+            
+            if wav.loops:
+                loop_start, loop_end = wav.loops[0]
+                found_loop = True
+            
+            # 'smpl' loop points count frames, so they hold for the mono downmix as they are
+            n_frames = wav.n_frames
+            digest = hashlib.blake2b(digest_size=16)
+            if not native:
+                # Keeps identical bytes in different layouts from sharing a digest
+                digest.update(f"{wav.format_tag},{wav.channels},{wav.bits_per_sample};".encode('ascii'))
+            with wav.data[:n_frames * wav.block_align] as pcm:
+                digest.update(pcm)
+            digest = digest.hexdigest()
+            
+            # Sanity check for loop points
+            loop_start, loop_end = sanitize_loop((loop_start, loop_end), n_frames)
+            
+            return {
+                'name': name[:20],
+                'path': wav_path,
+                'length': n_frames,
+                'sample_rate': wav.sample_rate,
+                'original_pitch': 60,
+                'pitch_correction': 0,
+                'loop_start': loop_start,
+                'loop_end': loop_end,
+                'found_loop': found_loop,
+                'digest': digest
+            }
+            
+    except Exception as e:
+        log.error(f"     [Error] Failed load {wav_path}: {e}")
+        return None
 
-# ==========================================
-# SF2 FILE GENERATION
-# ==========================================
+def read_pcm16(wav, n_frames):
+    """Up to n_frames of 16-bit little-endian mono PCM as bytes, converting (NumPy) if needed."""
+    if is_pcm16_mono(wav):
+        with wav.data[:n_frames * 2] as pcm:
+            return bytes(pcm)
+    return to_mono16(wav)[:n_frames].astype('<i2').tobytes()
+
+# Precompiled pdta record layouts (SF2 2.01 spec, section 7)
+CHUNK_HEADER_STRUCT = struct.Struct('<4sI')
+PHDR_STRUCT = struct.Struct('<20sHHHLLL')
+BAG_STRUCT = struct.Struct('<HH')
+MOD_STRUCT = struct.Struct('<HHhHH')
+GEN_STRUCT = struct.Struct('<Hh')
+KEY_RANGE_GEN_STRUCT = struct.Struct('<HBB')
+INST_STRUCT = struct.Struct('<20sH')
+SHDR_STRUCT = struct.Struct('<20sIIIIIBbHH')
+
+# Generators emitted per instrument region (see _build_igen)
+GENS_PER_REGION = 9
 
 class SF2Generator:
-    def __init__(self, name="NDS_Sound"):
+    def __init__(self, name="NDS_Sound", pcm_cache=None):
         self.name = name[:256]
+        self.pcm_cache = pcm_cache # SampleCache holding PCM already in memory (watch mode)
         self.samples = []
         self.instruments = []
         self.presets = []
+        self.sample_hashes = {} # Content key -> sample index, shares shdr entries between identical WAVs
+        self.dedup_count = 0
+        self.dedup_bytes_saved = 0
         
     def add_sample_from_wav(self, wav_path, name):
-        try:
-            loop_start = 0
-            loop_end = 0
-            found_loop = False
-            
-            # 1. Parse 'smpl' chunk for loop points
-            with open(wav_path, 'rb') as f:
-                riff = f.read(4)
-                if riff != b'RIFF': return None, False
-                file_size = struct.unpack('<I', f.read(4))[0]
-                wave_id = f.read(4)
-                if wave_id != b'WAVE': return None, False
-                
-                while f.tell() < file_size + 8:
-                    try:
-                        chunk_id = f.read(4)
-                        if len(chunk_id) < 4: break
-                        chunk_size = struct.unpack('<I', f.read(4))[0]
-                        chunk_start = f.tell()
-                        
-                        if chunk_id == b'smpl':
-                            f.seek(chunk_start + 28)
-                            num_loops = struct.unpack('<I', f.read(4))[0]
-                            if num_loops > 0:
-                                f.read(4)
-                                # Loop info
-                                loop_id = struct.unpack('<I', f.read(4))[0]
-                                loop_type = struct.unpack('<I', f.read(4))[0]
-                                loop_start = struct.unpack('<I', f.read(4))[0]
-                                loop_end = struct.unpack('<I', f.read(4))[0]
-                                print(f"     [Info] {name}: Found loop points {loop_start}-{loop_end}")
-                                found_loop = True
-                            break
-                        else:
-                            f.seek(chunk_start + chunk_size)
-                            if chunk_size % 2: f.read(1)
-                    except: break
-            
-            # 2. Read Audio Data (Assumes MONO)
-            with wave.open(wav_path, 'rb') as wav:
-                sample_width = wav.getsampwidth()
-                framerate = wav.getframerate()
-                n_frames = wav.getnframes()
-                audio_data = wav.readframes(n_frames)
-                
-                if sample_width != 2:
-                    print(f"     [Warning] {name}: 16-bit only, skipping")
-                    return None, False
-                
-                import array
-                samples_array = array.array('h')
-                samples_array.frombytes(audio_data)
-                
-                # Sanity check for loop points
-                if loop_end == 0 or loop_end >= len(samples_array):
-                    loop_end = len(samples_array) - 1
-                if loop_start >= loop_end:
-                    loop_start = 0
-                
-                sample = {
-                    'name': name[:20],
-                    'data': samples_array,
-                    'sample_rate': framerate,
-                    'original_pitch': 60,
-                    'pitch_correction': 0,
-                    'loop_start': loop_start,
-                    'loop_end': loop_end,
-                    'found_loop': found_loop 
-                }
-                
-                self.samples.append(sample)
-                return len(self.samples) - 1, found_loop
-                
-        except Exception as e:
-            print(f"     [Error] Failed load {wav_path}: {e}")
-            return None, False
+        sample = read_wav_sample(wav_path, name)
+        if sample is None: return None, False
+        return self.add_sample(sample)
+    
+    def add_sample(self, sample):
+        # Byte-identical audio with the same rate and loop reuses one sample
+        content_key = (sample['digest'], sample['length'], sample['sample_rate'],
+                       sample['loop_start'], sample['loop_end'], sample['found_loop'])
+        if content_key in self.sample_hashes:
+            self.dedup_count += 1
+            self.dedup_bytes_saved += sample['length'] * 2
+            return self.sample_hashes[content_key], sample['found_loop']
+        
+        self.samples.append(sample)
+        self.sample_hashes[content_key] = len(self.samples) - 1
+        return len(self.samples) - 1, sample['found_loop']
     
     def create_instrument(self, name, regions):
         inst = {'name': name[:20], 'regions': regions}
@@ -194,7 +202,8 @@ class SF2Generator:
         preset = {'name': name[:20], 'bank': bank, 'preset': preset_num, 'instrument_idx': instrument_idx}
         self.presets.append(preset)
     
-    def write_sf2(self, output_path):
+    def write_sf2(self, output_path, pdta_data=None):
+        """Writes the SoundFont. pdta_data may be passed in if build_pdta() already ran."""
         with open(output_path, 'wb') as f:
             f.write(b'RIFF')
             riff_size_pos = f.tell()
@@ -202,7 +211,7 @@ class SF2Generator:
             f.write(b'sfbk')
             self._write_info_chunk(f)
             self._write_sdta_chunk(f)
-            self._write_pdta_chunk(f)
+            self._write_pdta_chunk(f, pdta_data)
             file_size = f.tell()
             f.seek(riff_size_pos)
             f.write(struct.pack('<I', file_size - 8))
@@ -214,6 +223,8 @@ class SF2Generator:
         isng = b'EMU8000\x00'
         info_data += b'isng' + struct.pack('<I', len(isng)) + isng
         inam = (self.name + '\x00').encode('ascii')
+        # RIFF chunks are word aligned: the name is terminated with one or two zero bytes
+        if len(inam) % 2: inam += b'\x00'
         info_data += b'INAM' + struct.pack('<I', len(inam)) + inam
         f.write(b'LIST')
         f.write(struct.pack('<I', len(info_data) + 4))
@@ -221,154 +232,487 @@ class SF2Generator:
         f.write(info_data)
     
     def _write_sdta_chunk(self, f):
-        smpl_data = b''
-        for sample in self.samples:
-            smpl_data += sample['data'].tobytes()
-        smpl_data += b'\x00' * (46 * 2)
+        # Sizes are known from frame counts, so each sample's PCM is written
+        # straight from its mapped source WAV without building the whole blob in memory
+        smpl_size = (sum(sample['length'] for sample in self.samples) + 46) * 2
         f.write(b'LIST')
-        f.write(struct.pack('<I', len(smpl_data) + 12))
+        f.write(struct.pack('<I', smpl_size + 12))
         f.write(b'sdta')
         f.write(b'smpl')
-        f.write(struct.pack('<I', len(smpl_data)))
-        f.write(smpl_data)
+        f.write(struct.pack('<I', smpl_size))
+        for sample in self.samples:
+            self._copy_sample_pcm(sample, f)
+        f.write(b'\x00' * (46 * 2))
     
-    def _write_pdta_chunk(self, f):
-        pdta_data = b''
-        chunk_writers = [
-            (b'phdr', self._build_phdr), (b'pbag', self._build_pbag), 
-            (b'pmod', self._build_pmod), (b'pgen', self._build_pgen), 
-            (b'inst', self._build_inst), (b'ibag', self._build_ibag),
-            (b'imod', self._build_imod), (b'igen', self._build_igen), 
-            (b'shdr', self._build_shdr)
-        ]
-        
-        for chunk_id, func in chunk_writers:
-            data = func()
-            pdta_data += chunk_id + struct.pack('<I', len(data)) + data
-            
+    def _copy_sample_pcm(self, sample, f):
+        size = sample['length'] * 2
+        pcm = self.pcm_cache.pcm(sample['path']) if self.pcm_cache else None
+        if pcm is not None and len(pcm) == size:
+            f.write(pcm)
+            return
+        with WavFile(sample['path']) as wav:
+            if is_pcm16_mono(wav):
+                with wav.data[:size] as pcm:
+                    f.write(pcm)
+                    missing = size - len(pcm)
+            else:
+                pcm = read_pcm16(wav, sample['length'])
+                f.write(pcm)
+                missing = size - len(pcm)
+        # Keep offsets in shdr valid even if the source changed since loading
+        if missing > 0:
+            f.write(b'\x00' * missing)
+    
+    def _write_pdta_chunk(self, f, pdta_data=None):
+        if pdta_data is None: pdta_data = self.build_pdta()
         f.write(b'LIST')
-        f.write(struct.pack('<I', len(pdta_data) + 4))
-        f.write(b'pdta')
+        f.write(struct.pack('<I', len(pdta_data)))
         f.write(pdta_data)
     
-    def _build_phdr(self):
-        data = b''
+    def build_pdta(self):
+        """Builds the 'pdta' LIST body into a single preallocated buffer."""
+        n_regions = sum(len(inst['regions']) for inst in self.instruments)
+        if n_regions * GENS_PER_REGION > 0xFFFF:
+            raise ValueError(f"{n_regions} regions exceed the SF2 limit of {0xFFFF // GENS_PER_REGION} (16-bit generator index)")
+        layout = [
+            (b'phdr', PHDR_STRUCT.size * (len(self.presets) + 1), self._build_phdr),
+            (b'pbag', BAG_STRUCT.size * (len(self.presets) + 1), self._build_pbag),
+            (b'pmod', MOD_STRUCT.size, self._build_pmod),
+            (b'pgen', GEN_STRUCT.size * (len(self.presets) + 1), self._build_pgen),
+            (b'inst', INST_STRUCT.size * (len(self.instruments) + 1), self._build_inst),
+            (b'ibag', BAG_STRUCT.size * (n_regions + 1), self._build_ibag),
+            (b'imod', MOD_STRUCT.size, self._build_imod),
+            (b'igen', GEN_STRUCT.size * (n_regions * GENS_PER_REGION + 1), self._build_igen),
+            (b'shdr', SHDR_STRUCT.size * (len(self.samples) + 1), self._build_shdr)
+        ]
+        
+        buf = bytearray(4 + sum(CHUNK_HEADER_STRUCT.size + size for _, size, _ in layout))
+        buf[0:4] = b'pdta'
+        offset = 4
+        for chunk_id, size, func in layout:
+            CHUNK_HEADER_STRUCT.pack_into(buf, offset, chunk_id, size)
+            offset += CHUNK_HEADER_STRUCT.size
+            end = func(buf, offset)
+            if end != offset + size:
+                raise RuntimeError(f"{chunk_id.decode()} wrote {end - offset} bytes, expected {size}")
+            offset = end
+        return buf
+    
+    def _build_phdr(self, buf, offset):
         bag_idx = 0
         for preset in self.presets:
-            data += preset['name'].ljust(20, '\x00').encode('ascii')
-            data += struct.pack('<HHHLLL', preset['preset'], preset['bank'], bag_idx, 0, 0, 0)
+            PHDR_STRUCT.pack_into(buf, offset, preset['name'].encode('ascii'),
+                                  preset['preset'], preset['bank'], bag_idx, 0, 0, 0)
+            offset += PHDR_STRUCT.size
             bag_idx += 1
-        data += b'EOP\x00'.ljust(20, b'\x00')
-        data += struct.pack('<HHHLLL', 0, 0, bag_idx, 0, 0, 0)
-        return data
+        PHDR_STRUCT.pack_into(buf, offset, b'EOP', 0, 0, bag_idx, 0, 0, 0)
+        return offset + PHDR_STRUCT.size
     
-    def _build_pbag(self):
-        data = b''
+    def _build_pbag(self, buf, offset):
         gen_idx = 0
         for _ in self.presets:
-            data += struct.pack('<HH', gen_idx, 0)
+            BAG_STRUCT.pack_into(buf, offset, gen_idx, 0)
+            offset += BAG_STRUCT.size
             gen_idx += 1
-        data += struct.pack('<HH', gen_idx, 0)
-        return data
+        BAG_STRUCT.pack_into(buf, offset, gen_idx, 0)
+        return offset + BAG_STRUCT.size
     
-    def _build_pmod(self):
-        return struct.pack('<HHhHH', 0, 0, 0, 0, 0)
+    def _build_pmod(self, buf, offset):
+        MOD_STRUCT.pack_into(buf, offset, 0, 0, 0, 0, 0)
+        return offset + MOD_STRUCT.size
     
-    def _build_pgen(self):
-        data = b''
+    def _build_pgen(self, buf, offset):
         for preset in self.presets:
-            data += struct.pack('<HH', 41, preset['instrument_idx'])
-        data += struct.pack('<HH', 0, 0)
-        return data
+            GEN_STRUCT.pack_into(buf, offset, 41, preset['instrument_idx'])
+            offset += GEN_STRUCT.size
+        GEN_STRUCT.pack_into(buf, offset, 0, 0)
+        return offset + GEN_STRUCT.size
     
-    def _build_inst(self):
-        data = b''
+    def _build_inst(self, buf, offset):
         bag_idx = 0
         for inst in self.instruments:
-            data += inst['name'].ljust(20, '\x00').encode('ascii')
-            data += struct.pack('<H', bag_idx)
+            INST_STRUCT.pack_into(buf, offset, inst['name'].encode('ascii'), bag_idx)
+            offset += INST_STRUCT.size
             bag_idx += len(inst['regions'])
-        data += b'EOI\x00'.ljust(20, b'\x00')
-        data += struct.pack('<H', bag_idx)
-        return data
+        INST_STRUCT.pack_into(buf, offset, b'EOI', bag_idx)
+        return offset + INST_STRUCT.size
     
-    def _build_ibag(self):
-        data = b''
+    def _build_ibag(self, buf, offset):
         gen_idx = 0
         for inst in self.instruments:
             for _ in inst['regions']:
-                data += struct.pack('<HH', gen_idx, 0)
-                gen_idx += 9 # 9 Generators per region
-        data += struct.pack('<HH', gen_idx, 0)
-        return data
+                BAG_STRUCT.pack_into(buf, offset, gen_idx, 0)
+                offset += BAG_STRUCT.size
+                gen_idx += GENS_PER_REGION
+        BAG_STRUCT.pack_into(buf, offset, gen_idx, 0)
+        return offset + BAG_STRUCT.size
     
-    def _build_imod(self):
-        return struct.pack('<HHhHH', 0, 0, 0, 0, 0)
+    def _build_imod(self, buf, offset):
+        MOD_STRUCT.pack_into(buf, offset, 0, 0, 0, 0, 0)
+        return offset + MOD_STRUCT.size
     
-    def _build_igen(self):
-        data = b''
+    def _build_igen(self, buf, offset):
+        pack_gen = GEN_STRUCT.pack_into
+        step = GEN_STRUCT.size
         for inst in self.instruments:
             for region in inst['regions']:
+                # SF2 2.01 8.1.2: keyRange must be the first generator of a zone
+                # and sampleID the last (readers ignore anything after it)
+                # 43: Key Range
+                KEY_RANGE_GEN_STRUCT.pack_into(buf, offset, 43, region['key_min'], region['key_max'])
                 # 17: Pan
                 pan_val = int((region['pan'] - 64) * (500 / 64.0))
-                data += struct.pack('<Hh', 17, pan_val)
+                pack_gen(buf, offset + step, 17, pan_val)
                 # 34, 36, 37, 38: ADSR
                 # NOTE: Attack and Decay use 1:1 hardware mapping
                 # Release is scaled (Linear->Exponential)
-                data += struct.pack('<Hh', 34, ms_to_timecents(region['attack']))
-                data += struct.pack('<Hh', 36, ms_to_timecents(region['decay']))
-                data += struct.pack('<Hh', 37, region['sustain'])
-                data += struct.pack('<Hh', 38, ms_to_timecents(region['release']))
-                # 43: Key Range
-                data += struct.pack('<H', 43) + struct.pack('<BB', region['key_min'], region['key_max'])
-                # 53: Sample ID
-                data += struct.pack('<Hh', 53, region['sample_idx'])
+                pack_gen(buf, offset + step * 2, 34, region['attack_tc'])
+                pack_gen(buf, offset + step * 3, 36, region['decay_tc'])
+                pack_gen(buf, offset + step * 4, 37, region['sustain'])
+                pack_gen(buf, offset + step * 5, 38, region['release_tc'])
                 # 54: Sample Mode (0=No Loop, 1=Loop)
                 loop_val = 1 if region.get('loop_mode', 0) == 1 else 0
-                data += struct.pack('<Hh', 54, loop_val)
+                pack_gen(buf, offset + step * 6, 54, loop_val)
                 # 58: Root Key
-                data += struct.pack('<Hh', 58, region['root_key'])
-        data += struct.pack('<Hh', 0, 0)
-        return data
+                pack_gen(buf, offset + step * 7, 58, region['root_key'])
+                # 53: Sample ID
+                pack_gen(buf, offset + step * 8, 53, region['sample_idx'])
+                offset += step * GENS_PER_REGION
+        pack_gen(buf, offset, 0, 0)
+        return offset + step
     
-    def _build_shdr(self):
-        data = b''
+    def _build_shdr(self, buf, offset):
         sample_offset = 0
         for sample in self.samples:
-            name = sample['name'].ljust(20, '\x00').encode('ascii')
-            data += name
-            
             start = sample_offset
-            end = sample_offset + len(sample['data'])
+            end = sample_offset + sample['length']
             loop_start = start + sample['loop_start']
             # SF2 requirement: End loop is index AFTER the last sample of loop
             loop_end = start + sample['loop_end'] + 1
             
-            data += struct.pack('<I', start)
-            data += struct.pack('<I', end)
-            data += struct.pack('<I', loop_start)
-            data += struct.pack('<I', loop_end)
-            data += struct.pack('<I', sample['sample_rate'])
-            data += struct.pack('<B', sample['original_pitch'])
-            data += struct.pack('<b', sample['pitch_correction'])
-            data += struct.pack('<H', 0)
             # sfSampleType: ALWAYS 1 (Mono). 
-            data += struct.pack('<H', 1) 
-            
+            SHDR_STRUCT.pack_into(buf, offset, sample['name'].encode('ascii'),
+                                  start, end, loop_start, loop_end, sample['sample_rate'],
+                                  sample['original_pitch'], sample['pitch_correction'], 0, 1)
+            offset += SHDR_STRUCT.size
             sample_offset = end
             
-        data += b'EOS\x00'.ljust(20, b'\x00')
-        data += struct.pack('<IIIIIBBHH', 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        SHDR_STRUCT.pack_into(buf, offset, b'EOS', 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        return offset + SHDR_STRUCT.size
+
+# ==========================================
+# SAMPLE DISCOVERY
+# ==========================================
+
+# 'NN_name.wav' -> WaveID NN (any number of digits, e.g. 05_, 123_)
+WAVE_FILE_PATTERN = re.compile(r'^(\d+)_.*\.wav$', re.IGNORECASE)
+
+def build_sample_index(samples_dir, cache_path=None):
+    """Scans samples_dir once and maps each WaveID to its WAV path."""
+    samples_dir = os.path.abspath(samples_dir)
+    dir_mtime = os.stat(samples_dir).st_mtime_ns
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['dir'] == samples_dir and cached['mtime_ns'] == dir_mtime:
+                return {int(wid): os.path.join(samples_dir, fname) for wid, fname in cached['waves'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    with os.scandir(samples_dir) as entries:
+        wav_names = sorted(e.name for e in entries if e.is_file() and WAVE_FILE_PATTERN.match(e.name))
+
+    waves = {}
+    for fname in wav_names:
+        wave_id = int(WAVE_FILE_PATTERN.match(fname).group(1))
+        if wave_id in waves:
+            log.warning(f"  [Warning] Duplicate WaveID {wave_id}: using {waves[wave_id]}, ignoring {fname}")
+            continue
+        waves[wave_id] = fname
+
+    if cache_path:
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'dir': samples_dir, 'mtime_ns': dir_mtime, 'waves': waves}, f, indent=1)
+        except OSError as e:
+            log.warning(f"  [Warning] Could not write sample index {cache_path}: {e}")
+
+    return {wave_id: os.path.join(samples_dir, fname) for wave_id, fname in waves.items()}
+
+# ==========================================
+# BUILD CACHE
+# ==========================================
+
+MANIFEST_VERSION = 1
+HELPER_MODULES = ('wav_io', 'nds_envelope', 'nds_budget')
+
+def fingerprint(*parts):
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode('utf-8'), digest_size=16).hexdigest()
+
+def converter_fingerprint():
+    """Settings and converter code that affect every output."""
+    code = hashlib.blake2b(digest_size=16)
+    # Helpers imported lazily may not be loaded yet, so they are located rather than looked up
+    for path in [__file__] + [importlib.util.find_spec(name).origin for name in HELPER_MODULES]:
+        with open(path, 'rb') as f:
+            code.update(f.read())
+    return fingerprint(code.hexdigest(), WAVE_ARCHIVE_IDS, SF2_RELEASE_SCALAR)
+
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+class BuildManifest:
+    """Fingerprints of the last successful build, stored as JSON next to the SBNK output."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {'version': MANIFEST_VERSION, 'instruments': {}, 'samples': {}, 'outputs': {}}
+        self.used_samples = set()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def is_fresh(self, kind, key, output_path):
+        entry = self.data['outputs'].get(kind)
+        if not entry or entry['key'] != key or entry['path'] != os.path.abspath(output_path):
+            return False
+        try:
+            return entry['stamp'] == file_stamp(output_path)
+        except OSError:
+            return False
+
+    def record_output(self, kind, key, output_path):
+        self.data['outputs'][kind] = {'key': key, 'path': os.path.abspath(output_path), 'stamp': file_stamp(output_path)}
+
+    def changed_instruments(self, inst_hashes):
+        old = self.data['instruments']
+        return sorted(int(i) for i in set(old) | set(inst_hashes) if old.get(i) != inst_hashes.get(i))
+
+    def get_sample(self, wav_path):
+        entry = self.data['samples'].get(os.path.abspath(wav_path))
+        try:
+            if entry and entry['stamp'] == file_stamp(wav_path):
+                self.used_samples.add(os.path.abspath(wav_path))
+                return dict(entry['sample'], path=wav_path)
+        except OSError:
+            pass
+        return None
+
+    def put_sample(self, wav_path, sample):
+        self.data['samples'][os.path.abspath(wav_path)] = {'stamp': file_stamp(wav_path), 'sample': sample}
+        self.used_samples.add(os.path.abspath(wav_path))
+
+    def save(self, inst_hashes):
+        self.data['instruments'] = inst_hashes
+        # Drop WAVs the last SF2 build no longer referenced
+        if self.used_samples:
+            self.data['samples'] = {p: e for p, e in self.data['samples'].items() if p in self.used_samples}
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=1)
+        except OSError as e:
+            log.warning(f"  [Warning] Could not write build manifest {self.path}: {e}")
+
+# ==========================================
+# SAMPLE CACHE (watch mode)
+# ==========================================
+
+class SampleCache:
+    """
+    Least-recently-used store of loaded samples and their PCM, capped at
+    max_bytes of PCM. Entries are keyed by path and revalidated by file stamp.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict() # abspath -> (stamp, sample, pcm)
+        self.size = 0
+
+    def get(self, wav_path):
+        key = os.path.abspath(wav_path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        try:
+            fresh = entry[0] == file_stamp(wav_path)
+        except OSError:
+            fresh = False
+        if not fresh:
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return dict(entry[1], path=wav_path)
+
+    def pcm(self, wav_path):
+        entry = self.entries.get(os.path.abspath(wav_path))
+        return entry[2] if entry else None
+
+    def put(self, wav_path, stamp, sample, pcm):
+        key = os.path.abspath(wav_path)
+        self._drop(key)
+        if len(pcm) > self.max_bytes:
+            return
+        self.entries[key] = (stamp, sample, pcm)
+        self.size += len(pcm)
+        while self.size > self.max_bytes:
+            _, (_, _, old_pcm) = self.entries.popitem(last=False)
+            self.size -= len(old_pcm)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.size -= len(entry[2])
+
+def read_cached_sample(wav_path, name):
+    """read_wav_sample plus the PCM bytes, for SampleCache. Returns (stamp, sample, pcm) or None."""
+    try:
+        stamp = file_stamp(wav_path)
+    except OSError:
+        stamp = None
+    sample = read_wav_sample(wav_path, name)
+    if sample is None:
+        return None
+    with WavFile(wav_path) as wav:
+        pcm = read_pcm16(wav, sample['length'])
+    return stamp, sample, pcm
+
+# ==========================================
+# BUILD REPORT
+# ==========================================
+
+class BuildReport:
+    """Wall time (and, if trace_memory, peak Python allocations) per stage, plus output counts."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counts = {}
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'seconds': 0.0})
+            entry['seconds'] += time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                entry['peak_bytes'] = max(entry.get('peak_bytes', 0), peak)
+
+    def count(self, **counts):
+        self.counts.update(counts)
+
+    def to_dict(self):
+        data = {'stages': self.stages, 'counts': self.counts}
+        if resource:
+            data['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
         return data
 
+    def summary_lines(self):
+        lines = [f"  {'STAGE':<14} {'TIME (ms)':>10}" + (f" {'PEAK (KB)':>10}" if self.trace_memory else "")]
+        for name, entry in self.stages.items():
+            line = f"  {name:<14} {entry['seconds'] * 1000:>10.2f}"
+            if 'peak_bytes' in entry:
+                line += f" {entry['peak_bytes'] / 1024:>10.1f}"
+            lines.append(line)
+        lines.append("  " + ", ".join(f"{k}={v}" for k, v in self.counts.items()))
+        return lines
+
 # ==========================================
-# MAIN PARSING LOGIC
+# BANK IR (parsed once, shared by the SBNK and SF2 backends)
 # ==========================================
 
-def parse_csv_to_sbnk_and_sf2(csv_path, output_sbnk_path, output_sf2_path):
-    print(f"Reading: {os.path.basename(csv_path)}")
-    
-    inst_groups = {}
+SINGLE_NOTE_TYPES = ('simple', 'psg', 'pcm')
+LOOP_ON_VALUES = ('1', 'yes', 'true', 'loop')
+LOOP_OFF_VALUES = ('0', 'no', 'false')
+
+class RegionDef:
+    """One validated CSV row, covering keys key_min..key_max of its instrument."""
+    __slots__ = ('line', 'key_min', 'key_max', 'note_type', 'wave_id', 'root_key',
+                 'attack', 'decay', 'sustain', 'release', 'pan', 'loop')
+
+    def __init__(self, row, line):
+        self.line = line
+        self.key_min = parse_int_field(row, 'KeyMin', None, line)
+        self.key_max = parse_int_field(row, 'KeyMax', None, line)
+
+        n_type_raw = (row.get('NoteType') or 'PCM').upper()
+        self.note_type = 'pcm'
+        if 'SQUARE' in n_type_raw or 'PSG' in n_type_raw:
+            self.note_type = 'noise' if 'NOISE' in n_type_raw else 'psg'
+
+        self.wave_id = parse_int_field(row, 'WaveID', 0, line, 0xFFFF)
+        self.root_key = parse_int_field(row, 'RootKey', 60, line)
+        self.attack = parse_int_field(row, 'Attack', 127, line)
+        self.decay = parse_int_field(row, 'Decay', 127, line)
+        self.sustain = parse_int_field(row, 'Sustain', 127, line)
+        self.release = parse_int_field(row, 'Release', 127, line)
+        self.pan = parse_int_field(row, 'Pan', 64, line)
+
+        # None = auto-detect from the WAV's 'smpl' chunk
+        loop_col = (row.get('LOOP') or '').strip().lower()
+        self.loop = 1 if loop_col in LOOP_ON_VALUES else 0 if loop_col in LOOP_OFF_VALUES else None
+
+    def with_keys(self, key_min, key_max):
+        region = object.__new__(RegionDef)
+        for name in RegionDef.__slots__:
+            setattr(region, name, getattr(self, name))
+        region.key_min, region.key_max = key_min, key_max
+        return region
+
+    def astuple(self):
+        return tuple(getattr(self, name) for name in RegionDef.__slots__[1:])
+
+class InstrumentDef:
+    """
+    An instrument with its regions resolved for its type:
+    single note: one region 0-127; regional: sorted by KeyMax, spanning
+    (previous KeyMax + 1)..KeyMax; range: non-overlapping key runs within
+    first_key..last_key (gaps get a default note in the SBNK, see make_sbnk).
+    """
+    __slots__ = ('inst_id', 'type', 'name', 'regions', 'first_key', 'last_key')
+
+    def __init__(self, inst_id, inst_type, name, regions, first_key=0, last_key=127):
+        self.inst_id = inst_id
+        self.type = inst_type
+        self.name = name
+        self.regions = regions
+        self.first_key = first_key
+        self.last_key = last_key
+
+    def astuple(self):
+        return (self.type, self.name, self.first_key, self.last_key, [r.astuple() for r in self.regions])
+
+def parse_int_field(row, key, default, line, max_val=127):
+    raw = (row.get(key) or '').strip()
+    if not raw: return default
+    try:
+        val = int(raw)
+    except ValueError:
+        raise ValueError(f"Line {line}: {key} must be a whole number, got {raw!r}") from None
+    if not 0 <= val <= max_val:
+        raise ValueError(f"Line {line}: {key} must be between 0 and {max_val}, got {val}")
+    return val
+
+def read_bank_csv(csv_path):
+    """Parses the CSV once into {InstID: InstrumentDef}, in order of first appearance."""
+    inst_rows = {}
     with open(csv_path, 'r', encoding='utf-8-sig') as f:
         reader = csv.DictReader(f)
         if not reader.fieldnames or 'InstID' not in reader.fieldnames:
@@ -377,186 +721,1000 @@ def parse_csv_to_sbnk_and_sf2(csv_path, output_sbnk_path, output_sf2_path):
             if not row['InstID'] or row['InstID'].startswith('#'): continue
             try:
                 inst_id = int(row['InstID'])
-                if inst_id not in inst_groups: inst_groups[inst_id] = []
-                inst_groups[inst_id].append(row)
             except ValueError: continue
+            inst_rows.setdefault(inst_id, []).append((row, reader.line_num))
+
+    bank = {}
+    for inst_id, rows in inst_rows.items():
+        first_row = rows[0][0]
+        inst_type = (first_row.get('Type') or '').lower().strip().replace(" ", "")
+        name = (first_row.get('Comment') or '')[:20] or f"Inst{inst_id:03d}"
+        # Only rows that end up in the bank are validated: Null and unknown
+        # instruments may hold placeholder values, and single-note ones use their first row
+        if inst_type in ('regional', 'range'):
+            regions = [RegionDef(row, line) for row, line in rows]
+
+        if inst_type == 'null':
+            bank[inst_id] = InstrumentDef(inst_id, inst_type, name, [])
+        elif inst_type in SINGLE_NOTE_TYPES:
+            bank[inst_id] = InstrumentDef(inst_id, inst_type, name, [RegionDef(*rows[0]).with_keys(0, 127)])
+        elif inst_type == 'regional':
+            sorted_regions = sorted(regions, key=lambda r: 127 if r.key_max is None else r.key_max)
+            resolved = []
+            prev = -1
+            for r in sorted_regions:
+                km = 127 if r.key_max is None else r.key_max
+                resolved.append(r.with_keys(prev + 1, km))
+                prev = km
+            bank[inst_id] = InstrumentDef(inst_id, inst_type, name, resolved)
+        elif inst_type == 'range':
+            key_span = resolve_key_runs(regions)
+            if key_span:
+                min_k, max_k, runs = key_span
+                bank[inst_id] = InstrumentDef(inst_id, inst_type, name,
+                                              [r.with_keys(a, b) for a, b, r in runs], min_k, max_k)
+            else:
+                bank[inst_id] = InstrumentDef(inst_id, inst_type, name, [])
+        else:
+            log.warning(f"  [Warning] Inst {inst_id} (line {rows[0][1]}): unknown Type {inst_type!r}, skipping")
+    return bank
 
+def resolve_key_runs(regions):
+    """
+    Resolves Range regions into (min_key, max_key, runs), where runs are sorted,
+    non-overlapping (key_min, key_max, region) intervals. Later rows win where
+    rows overlap. Returns None if no row has both KeyMin and KeyMax.
+    """
+    valid = [r for r in regions if r.key_min is not None and r.key_max is not None]
+    if not valid: return None
+    bounds = [r.key_min for r in valid] + [r.key_max for r in valid]
+
+    runs = []
+    for r in valid:
+        lo, hi = r.key_min, r.key_max
+        if lo > hi: continue
+        # Trim whatever earlier runs this row covers
+        kept = []
+        for a, b, prev in runs:
+            if b < lo or a > hi:
+                kept.append((a, b, prev))
+                continue
+            if a < lo: kept.append((a, lo - 1, prev))
+            if b > hi: kept.append((hi + 1, b, prev))
+        kept.append((lo, hi, r))
+        runs = sorted(kept, key=lambda run: run[0])
+
+    # Merge neighbours left over from splitting the same row
+    merged = []
+    for a, b, r in runs:
+        if merged and merged[-1][2] is r and merged[-1][1] + 1 == a:
+            merged[-1] = (merged[-1][0], b, r)
+        else:
+            merged.append((a, b, r))
+    return min(bounds), max(bounds), merged
+
+# ==========================================
+# MIDI USAGE FILTER (--midi)
+# ==========================================
+
+def used_key_runs(key_min, key_max, keys):
+    """Contiguous (first, last) runs of keys inside key_min..key_max."""
+    runs = []
+    for key in sorted(k for k in keys if key_min <= k <= key_max):
+        if runs and runs[-1][1] + 1 == key:
+            runs[-1][1] = key
+        else:
+            runs.append([key, key])
+    return [tuple(run) for run in runs]
+
+def filter_bank(bank, usage):
+    """
+    Keeps what the songs in usage (a midi_usage.MidiUsage) can play: used
+    instruments, regional splits holding a used key (a dropped split's keys
+    fall to the next one, which only unused keys reach), and the used keys of
+    range instruments. Samples follow, since only kept regions are loaded.
+    """
+    kept = {}
+    for inst_id, inst in bank.items():
+        keys = usage.used_keys(inst_id)
+        if not keys or not inst.regions: continue
+
+        if inst.type in SINGLE_NOTE_TYPES:
+            kept[inst_id] = inst
+        elif inst.type == 'regional':
+            regions = []
+            prev = -1
+            for r in inst.regions:
+                # The SBNK stretches the last split to key 127
+                top = 127 if r is inst.regions[-1] else r.key_max
+                if any(r.key_min <= k <= top for k in keys):
+                    regions.append(r.with_keys(prev + 1, r.key_max))
+                    prev = r.key_max
+            if regions:
+                kept[inst_id] = InstrumentDef(inst_id, inst.type, inst.name, regions)
+        elif inst.type == 'range':
+            regions = [r.with_keys(a, b) for r in inst.regions for a, b in used_key_runs(r.key_min, r.key_max, keys)]
+            if regions:
+                kept[inst_id] = InstrumentDef(inst_id, inst.type, inst.name, regions,
+                                              regions[0].key_min, regions[-1].key_max)
+
+    log.info(f"  -> MIDI usage: kept {len(kept)} of {sum(1 for i in bank.values() if i.regions)} instruments, "
+             f"{sum(len(i.regions) for i in kept.values())} of {sum(len(i.regions) for i in bank.values())} regions")
+    return kept
+
+# ==========================================
+# MAIN PARSING LOGIC
+# ==========================================
+
+def parse_csv_to_sbnk_and_sf2(csv_path, output_sbnk_path, output_sf2_path, use_cache=BUILD_CACHE, report=None,
+                              budget=None, sample_cache=None, preview=None, usage=None, sdat=None,
+                              targets=OUTPUT_TARGETS):
+    """
+    Converts one CSV bank into the outputs named in targets. budget (see apply_budget) adds the sound RAM size
+    report and optional resampling before the SF2 is built; sample_cache
+    (a SampleCache) keeps loaded samples in memory across calls; preview
+    (see render_previews) renders every instrument to WAVs afterwards;
+    usage (a midi_usage.MidiUsage) drops everything no song plays; sdat
+    ({'path', 'bank', 'swar'}, see inject_into_sdat) also writes the bank
+    straight into a game's SDAT.
+    Returns the BuildReport with per-stage timings and counts.
+    """
+    report = report or BuildReport()
+    log.info(f"Reading: {os.path.basename(csv_path)}")
+    with report.stage('csv_read'):
+        bank = read_bank_csv(csv_path)
+    if usage is not None:
+        with report.stage('midi_filter'):
+            full_regions = sum(len(inst.regions) for inst in bank.values())
+            bank = filter_bank(bank, usage)
+        report.count(pruned_regions=full_regions - sum(len(inst.regions) for inst in bank.values()))
+    report.count(instruments=sum(1 for inst in bank.values() if inst.type != 'null'),
+                 regions=sum(len(inst.regions) for inst in bank.values()))
+
+    # BUILD CACHE: fingerprint every input that can change an output
+    settings_key = converter_fingerprint()
+    inst_hashes = {str(inst_id): fingerprint(inst.astuple()) for inst_id, inst in bank.items()}
+    manifest = BuildManifest(os.path.splitext(output_sbnk_path)[0] + BUILD_MANIFEST_SUFFIX) if use_cache else None
+    sbnk_key = fingerprint(settings_key, inst_hashes)
+    if manifest:
+        changed = manifest.changed_instruments(inst_hashes)
+        if changed and manifest.data['instruments']:
+            log.info(f"  -> Changed instruments: {', '.join(str(i) for i in changed)}")
+            report.count(changed_instruments=changed)
+
+    sbnk = None
+    if 'sbnk' in targets:
+        if manifest and manifest.is_fresh('sbnk', sbnk_key, output_sbnk_path):
+            log.info(f"SBNK up to date: {output_sbnk_path}")
+        else:
+            sbnk = build_sbnk(bank, output_sbnk_path, report)
+            report.count(sbnk_bytes=os.path.getsize(output_sbnk_path))
+            if manifest: manifest.record_output('sbnk', sbnk_key, output_sbnk_path)
+    if sdat:
+        with report.stage('sdat_inject'):
+            if inject_into_sdat(sdat['path'], sdat['bank'], sbnk or make_sbnk(bank), sdat.get('swar')):
+                report.count(sdat_updated=True)
+
+    # SF2 GENERATION
+    csv_dir = os.path.dirname(csv_path)
+    samples_dir = os.path.join(csv_dir, "Samples")
+    if not os.path.exists(samples_dir):
+        if 'sf2' in targets: log.info("Samples folder not found, skipping SF2.")
+        if manifest: manifest.save(inst_hashes)
+        if preview:
+            render_previews(bank, {}, os.path.splitext(output_sbnk_path)[0] + PREVIEW_DIR_SUFFIX, report=report, **preview)
+        return report
+
+    index_cache = os.path.join(csv_dir, SAMPLE_INDEX_FILENAME) if PERSIST_SAMPLE_INDEX else None
+    with report.stage('sample_index'):
+        sample_index = build_sample_index(samples_dir, index_cache)
+    if budget:
+        with report.stage('budget'):
+            fit_dir = os.path.splitext(output_sbnk_path)[0] + BUDGET_SAMPLES_DIR_SUFFIX
+            sample_index = apply_budget(bank, sample_index, samples_dir, fit_dir, budget, report)
+    if 'sf2' in targets:
+        wave_ids = sorted({r.wave_id for inst in bank.values() for r in inst.regions})
+        wave_stamps = [[wid, sample_index[wid], file_stamp(sample_index[wid])] for wid in wave_ids if wid in sample_index]
+        sf2_key = fingerprint(settings_key, inst_hashes, wave_stamps)
+
+        if manifest and manifest.is_fresh('sf2', sf2_key, output_sf2_path):
+            log.info(f"SF2 up to date: {output_sf2_path}")
+        else:
+            build_sf2(bank, sample_index, os.path.splitext(os.path.basename(csv_path))[0], output_sf2_path, manifest,
+                      report, sample_cache)
+            if manifest: manifest.record_output('sf2', sf2_key, output_sf2_path)
+
+    if manifest: manifest.save(inst_hashes)
+    if preview:
+        render_previews(bank, sample_index, os.path.splitext(output_sbnk_path)[0] + PREVIEW_DIR_SUFFIX,
+                        report=report, **preview)
+    log.info("Done!")
+    return report
+
+def build_sbnk(bank, output_sbnk_path, report=None):
+    report = report or BuildReport()
+    with report.stage('sbnk_build'):
+        sbnk = make_sbnk(bank)
+    with report.stage('sbnk_save'):
+        sbnk.saveToFile(output_sbnk_path)
+    log.info(f"SBNK saved to {output_sbnk_path}")
+    return sbnk
+
+def make_sbnk(bank):
     # SBNK GENERATION (HARDWARE ACCURATE)
+    import ndspy.soundBank
+
     sbnk = ndspy.soundBank.SBNK()
     sbnk.waveArchiveIDs = WAVE_ARCHIVE_IDS
-    max_id = max(inst_groups.keys()) if inst_groups else -1
+    max_id = max(bank.keys()) if bank else -1
     final_instruments = [None] * (max_id + 1)
 
-    for inst_id, rows in inst_groups.items():
-        inst_type = rows[0]['Type'].lower().strip().replace(" ", "")
-        print(f"  -> Processing Inst {inst_id} ({inst_type})...")
+    for inst_id, inst in bank.items():
+        log.debug(f"  -> Processing Inst {inst_id} ({inst.type})...")
 
-        if inst_type == 'null':
-            final_instruments[inst_id] = None
-        elif inst_type in ['simple', 'psg', 'pcm']:
-            final_instruments[inst_id] = ndspy.soundBank.SingleNoteInstrument(create_note_def(rows[0]))
-        elif inst_type == 'regional':
-            sorted_rows = sorted(rows, key=lambda r: int(r['KeyMax']) if r['KeyMax'] else 127)
-            regions = [ndspy.soundBank.RegionalInstrument.Region(
-                int(r['KeyMax']) if r['KeyMax'] else 127, create_note_def(r)) for r in sorted_rows]
+        if inst.type in SINGLE_NOTE_TYPES:
+            final_instruments[inst_id] = ndspy.soundBank.SingleNoteInstrument(create_note_def(inst.regions[0]))
+        elif inst.type == 'regional':
+            regions = [ndspy.soundBank.RegionalInstrument.Region(r.key_max, create_note_def(r)) for r in inst.regions]
             if regions and regions[-1].lastPitch < 127: regions[-1].lastPitch = 127
             final_instruments[inst_id] = ndspy.soundBank.RegionalInstrument(regions)
-        elif inst_type == 'range':
-            keys = []
-            valid_rows = []
-            for r in rows:
-                if r['KeyMin'] and r['KeyMax']:
-                    keys.extend([int(r['KeyMin']), int(r['KeyMax'])])
-                    valid_rows.append(r)
-            if keys:
-                min_k, max_k = min(keys), max(keys)
-                key_map = {}
-                for r in valid_rows:
-                    for k in range(int(r['KeyMin']), int(r['KeyMax']) + 1):
-                        key_map[k] = r
-                note_defs = []
-                for k in range(min_k, max_k + 1):
-                    if k in key_map: note_defs.append(create_note_def(key_map[k]))
-                    else: 
-                        d = ndspy.soundBank.NoteDefinition()
-                        d.pitch = 60
-                        note_defs.append(d)
-                final_instruments[inst_id] = ndspy.soundBank.RangeInstrument(min_k, note_defs)
+        elif inst.type == 'range' and inst.regions:
+            note_defs = []
+            next_key = inst.first_key
+            for r in inst.regions + [None]:
+                k_min = inst.last_key + 1 if r is None else r.key_min
+                # Keys not covered by any row get ndspy's default definition, which plays
+                # PCM wave 0 of archive slot 0 at its root pitch (as the original converter did)
+                for _ in range(next_key, k_min):
+                    d = ndspy.soundBank.NoteDefinition()
+                    d.pitch = 60
+                    note_defs.append(d)
+                if r is not None:
+                    note_defs.extend(create_note_def(r) for _ in range(r.key_min, r.key_max + 1))
+                    next_key = r.key_max + 1
+            final_instruments[inst_id] = ndspy.soundBank.RangeInstrument(inst.first_key, note_defs)
 
     sbnk.instruments = final_instruments
-    sbnk.saveToFile(output_sbnk_path)
-    print(f"SBNK saved to {output_sbnk_path}")
+    return sbnk
 
-    # SF2 GENERATION
-    csv_dir = os.path.dirname(csv_path)
-    samples_dir = os.path.join(csv_dir, "Samples")
-    if not os.path.exists(samples_dir):
-        print("Samples folder not found, skipping SF2.")
-        return
+def build_sf2(bank, sample_index, bank_name, output_sf2_path, manifest=None, report=None, sample_cache=None):
+    report = report or BuildReport()
+    sf2 = SF2Generator(bank_name, sample_cache)
+    with report.stage('sample_load'):
+        sample_map = load_sf2_samples(sf2, bank, sample_index, manifest, sample_cache, report)
+    with report.stage('sf2_pdta'):
+        add_sf2_instruments(sf2, bank, sample_map)
+        pdta_data = sf2.build_pdta()
+    with report.stage('sf2_sdta'):
+        sf2.write_sf2(output_sf2_path, pdta_data)
+    report.count(sf2_regions=sum(len(inst['regions']) for inst in sf2.instruments),
+                 samples=len(sf2.samples),
+                 sample_bytes=sum(sample['length'] * 2 for sample in sf2.samples),
+                 dedup_bytes_saved=sf2.dedup_bytes_saved,
+                 sf2_bytes=os.path.getsize(output_sf2_path))
+    log.info(f"SF2 saved to {output_sf2_path}")
 
-    sf2 = SF2Generator(os.path.splitext(os.path.basename(csv_path))[0])
-    sample_map = {} # Maps WaveID to (sf2_index, has_loop_points)
+def load_sf2_samples(sf2, bank, sample_index, manifest=None, sample_cache=None, report=None):
+    """
+    Adds every WAV the bank references to sf2. With a sample_cache, samples
+    come from memory when unchanged, and new reads keep their PCM there.
+    Returns {WaveID: (sf2_index, has_loop_points)}.
+    """
+    sample_map = {}
 
-    # Pre-load samples
-    for inst_id, rows in inst_groups.items():
-        for row in rows:
-            wave_id = get_int(row, 'WaveID', 0)
-            if wave_id in sample_map: continue
+    # Pre-load samples (first-use order, so shdr layout matches a serial load)
+    load_order = []
+    seen = set()
+    for inst in bank.values():
+        for region in inst.regions:
+            wave_id = region.wave_id
+            if wave_id in seen: continue
+            seen.add(wave_id)
             
-            wav_files = [f for f in os.listdir(samples_dir) if f.startswith(f"{wave_id:02d}_") and f.endswith('.wav')]
-            if not wav_files: continue
-            
-            idx, has_loop = sf2.add_sample_from_wav(os.path.join(samples_dir, wav_files[0]), os.path.splitext(wav_files[0])[0])
-            if idx is not None:
-                sample_map[wave_id] = (idx, has_loop)
-
-    # Build Instruments
-    for inst_id, rows in inst_groups.items():
-        if not rows: continue
-        inst_type = rows[0]['Type'].lower().strip().replace(" ", "")
-        inst_name = rows[0].get('Comment', f"Inst{inst_id:03d}")[:20] or f"Inst{inst_id:03d}"
-        
-        if inst_type == 'null': continue
+            wav_path = sample_index.get(wave_id)
+            if not wav_path: continue
+            load_order.append((wave_id, wav_path))
+
+    if sample_cache is not None:
+        # Cached metadata is only useful with its PCM, so the manifest is bypassed here
+        samples = [sample_cache.get(wav_path) for _, wav_path in load_order]
+    else:
+        samples = [manifest.get_sample(wav_path) if manifest else None for _, wav_path in load_order]
+    to_read = [i for i, sample in enumerate(samples) if sample is None]
+    if to_read:
+        # Loading is independent I/O + hashing per file; results come back in submission order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SAMPLE_LOAD_THREADS) as pool:
+            paths = [load_order[i][1] for i in to_read]
+            names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+            if sample_cache is None:
+                for i, sample in zip(to_read, pool.map(read_wav_sample, paths, names)):
+                    samples[i] = sample
+            else:
+                for i, result in zip(to_read, pool.map(read_cached_sample, paths, names)):
+                    if result is None: continue
+                    stamp, samples[i], pcm = result
+                    if stamp: sample_cache.put(load_order[i][1], stamp, samples[i], pcm)
+    if manifest:
+        # Cache hits skipped get_sample, so they are recorded as well
+        for i in (range(len(load_order)) if sample_cache is not None else to_read):
+            if samples[i] is not None: manifest.put_sample(load_order[i][1], samples[i])
+    if report: report.count(samples_read=len(to_read))
+
+    for (wave_id, wav_path), sample in zip(load_order, samples):
+        if sample is None: continue
+        if sample['found_loop']:
+            log.debug(f"     [Info] {sample['name']}: Found loop points {sample['loop_start']}-{sample['loop_end']}")
+        idx, has_loop = sf2.add_sample(sample)
+        sample_map[wave_id] = (idx, has_loop)
 
+    if sf2.dedup_count:
+        log.info(f"  -> Deduplicated {sf2.dedup_count} identical samples, saved {sf2.dedup_bytes_saved} bytes")
+    return sample_map
+
+def add_sf2_instruments(sf2, bank, sample_map):
+    for inst_id, inst in bank.items():
         sf2_regions = []
-        
-        # Helper to process a row into a region
-        def process_row_for_sf2(row, k_min, k_max):
-            wid = get_int(row, 'WaveID', 0)
-            if wid not in sample_map: return None
+        for region in inst.regions:
+            if region.wave_id not in sample_map: continue
+            s_idx, s_has_loop = sample_map[region.wave_id]
             
-            s_idx, s_has_loop = sample_map[wid]
+            # Loop Logic: CSV value wins, otherwise follow the WAV's loop points
+            loop_mode = region.loop if region.loop is not None else (1 if s_has_loop else 0)
             
-            # Loop Logic
-            loop_col = row.get('LOOP', '').strip().lower()
-            if loop_col in ['1', 'yes', 'true', 'loop']:
-                loop_mode = 1
-            elif loop_col in ['0', 'no', 'false']:
-                loop_mode = 0
-            else:
-                loop_mode = 1 if s_has_loop else 0
-            
-            # ADSR CALCULATION 
-            decay_raw = get_decay_time_hw(get_int(row, 'Decay', 127), get_int(row, 'Sustain', 127))
-            release_raw = get_release_time_hw(get_int(row, 'Release', 127), get_int(row, 'Sustain', 127))
+            # ADSR CALCULATION (table lookup, see nds_envelope.py)
+            # DECAY: UN-SCALED (Hardware Accurate punch)
+            # RELEASE: SCALED (Linear to Exponential fix)
+            attack_tc, decay_tc, sustain_cb, release_tc = sf2_envelope(
+                region.attack, region.decay, region.sustain, region.release, SF2_RELEASE_SCALAR)
 
-            return {
+            sf2_regions.append({
                 'sample_idx': s_idx,
-                'key_min': k_min, 'key_max': k_max,
-                'root_key': get_int(row, 'RootKey', 60),
-                'attack': get_attack_ms(get_int(row, 'Attack', 127)),
-                # DECAY: UN-SCALED (Hardware Accurate punch)
-                'decay': decay_raw, 
-                'sustain': get_sustain_db_sf2(get_int(row, 'Sustain', 127)),
-                # RELEASE: SCALED (Linear to Exponential fix)
-                'release': release_raw * SF2_RELEASE_SCALAR,
-                'pan': get_int(row, 'Pan', 64),
+                'key_min': region.key_min, 'key_max': region.key_max,
+                'root_key': region.root_key,
+                'attack_tc': attack_tc,
+                'decay_tc': decay_tc,
+                'sustain': sustain_cb,
+                'release_tc': release_tc,
+                'pan': region.pan,
                 'loop_mode': loop_mode
-            }
-
-        if inst_type in ['simple', 'psg', 'pcm']:
-            reg = process_row_for_sf2(rows[0], 0, 127)
-            if reg: sf2_regions.append(reg)
-            
-        elif inst_type == 'regional':
-            sorted_rows = sorted(rows, key=lambda r: int(r['KeyMax']) if r['KeyMax'] else 127)
-            prev = -1
-            for row in sorted_rows:
-                km = int(row['KeyMax']) if row['KeyMax'] else 127
-                reg = process_row_for_sf2(row, prev + 1, km)
-                if reg: sf2_regions.append(reg)
-                prev = km
-                
-        elif inst_type == 'range':
-            valid_rows = [r for r in rows if r['KeyMin'] and r['KeyMax']]
-            if valid_rows:
-                keys = [int(r['KeyMin']) for r in valid_rows] + [int(r['KeyMax']) for r in valid_rows]
-                k_map = {}
-                for r in valid_rows:
-                    for k in range(int(r['KeyMin']), int(r['KeyMax']) + 1):
-                        k_map[k] = r
-                for k in range(min(keys), max(keys) + 1):
-                    if k in k_map:
-                        reg = process_row_for_sf2(k_map[k], k, k)
-                        if reg: sf2_regions.append(reg)
+            })
 
         if sf2_regions:
-            idx = sf2.create_instrument(inst_name, sf2_regions)
-            sf2.create_preset(inst_name, 0, inst_id, idx)
-
-    sf2.write_sf2(output_sf2_path)
-    print(f"SF2 saved to {output_sf2_path}")
-    print("Done!")
-
-def create_note_def(row):
-    n_type_raw = row.get('NoteType', 'PCM').upper()
-    n_type = NoteType.PCM
-    if 'SQUARE' in n_type_raw or 'PSG' in n_type_raw:
-        n_type = NoteType.PSG_WHITE_NOISE if 'NOISE' in n_type_raw else NoteType.PSG_SQUARE_WAVE
+            idx = sf2.create_instrument(inst.name, sf2_regions)
+            sf2.create_preset(inst.name, 0, inst_id, idx)
+
+# ndspy.soundBank.NoteType member per RegionDef.note_type
+NOTE_TYPES = {'pcm': 'PCM', 'psg': 'PSG_SQUARE_WAVE', 'noise': 'PSG_WHITE_NOISE'}
+
+def create_note_def(region):
+    from ndspy.soundBank import NoteDefinition, NoteType
+
     nd = NoteDefinition()
-    nd.type = n_type
-    if n_type == NoteType.PCM:
-        nd.waveID = get_int(row, 'WaveID', 0)
-        nd.waveArchiveID = 0
-    elif n_type == NoteType.PSG_SQUARE_WAVE:
-        nd.dutyCycle = get_int(row, 'WaveID', 0)
-    nd.pitch = get_int(row, 'RootKey', 60)
-    nd.attack = get_int(row, 'Attack', 127)
-    nd.decay = get_int(row, 'Decay', 127)
-    nd.sustain = get_int(row, 'Sustain', 127)
-    nd.release = get_int(row, 'Release', 127)
-    nd.pan = get_int(row, 'Pan', 64)
+    nd.type = NoteType[NOTE_TYPES[region.note_type]]
+    if nd.type == NoteType.PCM:
+        nd.waveID = region.wave_id
+        nd.waveArchiveIDID = 0  # Slot in sbnk.waveArchiveIDs
+    elif nd.type == NoteType.PSG_SQUARE_WAVE:
+        nd.dutyCycle = region.wave_id
+    nd.pitch = region.root_key
+    nd.attack = region.attack
+    nd.decay = region.decay
+    nd.sustain = region.sustain
+    nd.release = region.release
+    nd.pan = region.pan
     return nd
 
-def get_int(row, key, default):
-    try: return int(row.get(key, default))
-    except: return default
+# ==========================================
+# SOUND RAM BUDGET
+# ==========================================
 
-if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        parse_csv_to_sbnk_and_sf2(sys.argv[1], os.path.splitext(sys.argv[1])[0] + ".sbnk", os.path.splitext(sys.argv[1])[0] + ".sf2")
-    elif len(sys.argv) == 4:
-        parse_csv_to_sbnk_and_sf2(sys.argv[1], sys.argv[2], sys.argv[3])
-    else:
+def read_wave_info(wav_path):
+    """Frame count, rate and loop of a WAV, from its headers only."""
+    with WavFile(wav_path) as wav:
+        loop = sanitize_loop(wav.loops[0], wav.n_frames) if wav.loops else None
+        return {'path': wav_path, 'frames': wav.n_frames, 'rate': wav.sample_rate, 'loop': loop}
+
+def referenced_waves(bank, sample_index):
+    """{WaveID: wave info} for every readable PCM wave the bank plays."""
+    wave_ids = sorted({r.wave_id for inst in bank.values() for r in inst.regions if r.note_type == 'pcm'})
+    waves = {}
+    for wave_id in wave_ids:
+        if wave_id not in sample_index: continue
+        try:
+            waves[wave_id] = read_wave_info(sample_index[wave_id])
+        except (OSError, ValueError) as e:
+            # Same file read_wav_sample skips; it has no size to budget
+            log.warning(f"     [Warning] {os.path.basename(sample_index[wave_id])}: {e}, "
+                        f"leaving it out of the size report")
+    return waves
+
+def log_size_report(waves, budget_bytes=None, fmt=BUDGET_FORMAT):
+    """Per-wave and SWAR total sizes in every SWAV encoding. Returns {format: total bytes}."""
+    import nds_budget
+
+    sizes = {wave_id: {f: nds_budget.wave_bytes(w['frames'], w['loop'], f) for f in nds_budget.FORMATS}
+             for wave_id, w in waves.items()}
+    log.info(f"  {'WAVE':>5} {'RATE':>7} {'FRAMES':>9} {'PCM16':>9} {'PCM8':>9} {'ADPCM':>9}  NAME")
+    for wave_id, w in waves.items():
+        s = sizes[wave_id]
+        log.info(f"  {wave_id:>5} {w['rate']:>7} {w['frames']:>9} {s['pcm16']:>9} {s['pcm8']:>9} {s['adpcm']:>9}"
+                 f"  {os.path.basename(w['path'])}")
+    totals = {f: nds_budget.archive_bytes(s[f] for s in sizes.values()) for f in nds_budget.FORMATS}
+    log.info(f"  SWAR total: PCM16 {totals['pcm16']}, PCM8 {totals['pcm8']}, ADPCM {totals['adpcm']} bytes")
+    if budget_bytes:
+        used = totals[fmt]
+        log.info(f"  Budget: {used} of {budget_bytes} bytes as {fmt.upper()} ({100 * used / budget_bytes:.1f}%)")
+    return totals
+
+def apply_budget(bank, sample_index, samples_dir, fit_dir, budget, report=None):
+    """
+    budget: {'bytes': target SWAR size or None, 'format': SWAV encoding,
+    'waves': WaveIDs allowed to be resampled (None = all), 'min_rate': Hz}.
+    Logs the size report. With a byte target, writes fit_dir (this bank's copy
+    of samples_dir with waves resampled to fit) and returns its sample index,
+    so the SF2 previews exactly what WAV-2-SWAV will encode from it.
+    """
+    import nds_budget
+
+    report = report or BuildReport()
+    fmt = budget['format']
+    waves = referenced_waves(bank, sample_index)
+    if not budget.get('bytes'):
+        totals = log_size_report(waves, fmt=fmt)
+        report.count(wave_bytes=totals[fmt])
+        return sample_index
+
+    rates, _ = nds_budget.plan_rates(waves, budget['bytes'], fmt, budget.get('waves'),
+                                     budget.get('min_rate', nds_budget.DEFAULT_MIN_RATE))
+    write_fitted_samples(samples_dir, fit_dir, {waves[wid]['path']: rate for wid, rate in rates.items()},
+                         {waves[wid]['path']: waves[wid] for wid in rates})
+
+    fitted_index = build_sample_index(fit_dir)
+    totals = log_size_report(referenced_waves(bank, fitted_index), budget['bytes'], fmt)
+    report.count(wave_bytes=totals[fmt], resampled_waves=len(rates))
+    if totals[fmt] > budget['bytes']:
+        log.warning(f"  [Warning] Still {totals[fmt] - budget['bytes']} bytes over budget with the resampled waves at the minimum rate")
+    log.info(f"  -> Fitted samples written to {fit_dir}")
+    return fitted_index
+
+def write_fitted_samples(samples_dir, fit_dir, new_rates, wave_infos):
+    """
+    Mirrors every NN_name.wav of samples_dir into fit_dir, so SWAR indices
+    stay aligned, resampling the paths in new_rates. Unchanged files keep
+    their stamps, so the build cache still sees them as up to date.
+    """
+    import nds_budget
+    from wav_io import to_mono16, write_wav16
+
+    os.makedirs(fit_dir, exist_ok=True)
+    with os.scandir(samples_dir) as entries:
+        names = sorted(e.name for e in entries if e.is_file() and WAVE_FILE_PATTERN.match(e.name))
+
+    for name in names:
+        src = os.path.join(samples_dir, name)
+        dst = os.path.join(fit_dir, name)
+        if src not in new_rates:
+            if not os.path.exists(dst) or file_stamp(dst) != file_stamp(src):
+                shutil.copy2(src, dst)
+            continue
+
+        info = wave_infos[src]
+        with WavFile(src) as wav:
+            frames = to_mono16(wav)
+        out, loop, exact_rate = nds_budget.resample(frames, new_rates[src], info['rate'], info['loop'])
+        rate = round(exact_rate)
+        # A looped wave's rate follows its rounded loop length; the header rate is whole Hz
+        detune = 1200 * math.log2(rate / exact_rate)
+        log.info(f"     [Info] {name}: {info['rate']} Hz -> {rate} Hz ({detune:+.2f} cents)")
+
+        # Per process, so an interrupted or concurrent build never reuses another's file
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        write_wav16(tmp, out, rate, loop)
+        if os.path.exists(dst) and file_stamp(dst)[0] == os.path.getsize(tmp):
+            with open(dst, 'rb') as a, open(tmp, 'rb') as b:
+                if a.read() == b.read():
+                    os.remove(tmp)
+                    continue
+        os.replace(tmp, dst)
+
+    # Drop waves that no longer exist in Samples
+    with os.scandir(fit_dir) as entries:
+        stale = [e.path for e in entries if e.is_file() and WAVE_FILE_PATTERN.match(e.name) and e.name not in names]
+    for path in stale:
+        os.remove(path)
+
+def parse_byte_size(text):
+    """'300000', '300K', '1.5M' -> bytes (K/M are 1024-based)."""
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KM]?)I?B?\s*$', text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * {'': 1, 'K': 1024, 'M': 1024 * 1024}[match.group(2).upper()])
+
+# ==========================================
+# SDAT INJECTION (--sdat)
+# ==========================================
+
+def find_sdat_entry(entries, key, kind):
+    """Index of an SDAT (name, item) list entry, by number or symbol name (any case)."""
+    if str(key).isdigit():
+        index = int(key)
+        if index < len(entries) and entries[index][1] is not None:
+            return index
+        raise ValueError(f"The SDAT has no {kind} #{index}")
+    for index, (name, item) in enumerate(entries):
+        if name and name.lower() == str(key).lower() and item is not None:
+            return index
+    raise ValueError(f"The SDAT has no {kind} named {key!r}")
+
+def archive_notes(sbnk):
+    """PCM note definitions of sbnk that play from wave archive slot 0 (see create_note_def)."""
+    import ndspy.soundBank
+
+    for inst in sbnk.instruments:
+        if isinstance(inst, ndspy.soundBank.SingleNoteInstrument):
+            note_defs = [inst.noteDefinition]
+        elif isinstance(inst, ndspy.soundBank.RangeInstrument):
+            note_defs = inst.noteDefinitions
+        elif isinstance(inst, ndspy.soundBank.RegionalInstrument):
+            note_defs = [region.noteDefinition for region in inst.regions]
+        else:
+            continue
+        for nd in note_defs:
+            if nd.type == ndspy.soundBank.NoteType.PCM and nd.waveArchiveIDID == 0:
+                yield nd
+
+def packed_wave_ids(swar_path):
+    """
+    The Samples indices SWAV-2-SWAR --sbnk packed into swar_path, from its
+    build manifest, or None if the SWAR holds every wave in folder order.
+    """
+    try:
+        with open(swar_path + BUILD_MANIFEST_SUFFIX, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A manifest left over from another SWAR says nothing about this one
+    if manifest.get('output') != file_stamp(swar_path):
+        return None
+    return manifest.get('wave_ids')
+
+def point_bank_at_swar(sbnk, n_waves, wave_ids=None):
+    """
+    Maps sbnk's WaveIDs (Samples indices) to a SWAR compacted to wave_ids,
+    then checks that every one is inside its n_waves waves. Raises ValueError
+    rather than let the bank play the wrong waves.
+    """
+    notes = list(archive_notes(sbnk))
+    if wave_ids is not None:
+        new_index = {wave_id: i for i, wave_id in enumerate(wave_ids)}
+        missing = sorted({nd.waveID for nd in notes} - set(new_index))
+        if missing:
+            raise ValueError(f"The SWAR was pruned without WaveID(s) {', '.join(map(str, missing))}; "
+                             f"run SWAV-2-SWAR.py --sbnk with this bank first")
+        for nd in notes:
+            nd.waveID = new_index[nd.waveID]
+    outside = sorted({nd.waveID for nd in notes if nd.waveID >= n_waves})
+    if outside:
+        raise ValueError(f"WaveID(s) {', '.join(map(str, outside))} are past the end of "
+                         f"wave archive #{WAVE_ARCHIVE_IDS[0]} ({n_waves} waves)")
+
+def inject_into_sdat(sdat_path, bank_key, sbnk, swar_path=None):
+    """
+    Replaces bank bank_key of the SDAT with sbnk (its wave archives are
+    WAVE_ARCHIVE_IDS) and, with swar_path, wave archive WAVE_ARCHIVE_IDS[0]
+    with that SWAR, then saves once. If SWAV-2-SWAR pruned that SWAR, the
+    bank's WaveIDs are compacted to match it. Untouched entries are written
+    back as ndspy loaded them, and nothing is saved if the entries are
+    already identical. Returns True if the SDAT was rewritten.
+    """
+    import ndspy.soundArchive
+    import ndspy.soundWaveArchive
+
+    sdat = ndspy.soundArchive.SDAT.fromFile(sdat_path)
+    bank_index = find_sdat_entry(sdat.banks, bank_key, "bank")
+    bank_name, old_sbnk = sdat.banks[bank_index]
+
+    # Keep the entry's INFO flags and file slot, so the file table order is unchanged
+    sbnk.unk02 = old_sbnk.unk02
+    sbnk.dataMergeOptimizationID = old_sbnk.dataMergeOptimizationID
+    for wave_archive_id in sbnk.waveArchiveIDs:
+        if wave_archive_id is not None and (wave_archive_id >= len(sdat.waveArchives)
+                                            or sdat.waveArchives[wave_archive_id][1] is None):
+            log.warning(f"  [Warning] WAVE_ARCHIVE_IDS: the SDAT has no wave archive #{wave_archive_id}")
+
+    changed = False
+    swar_index = WAVE_ARCHIVE_IDS[0]
+    if swar_path:
+        if swar_index >= len(sdat.waveArchives):
+            raise ValueError(f"The SDAT has no wave archive #{swar_index} (WAVE_ARCHIVE_IDS[0])")
+        swar_name, old_swar = sdat.waveArchives[swar_index]
+        with open(swar_path, 'rb') as f:
+            swar_data = f.read()
+        swar = ndspy.soundWaveArchive.SWAR(swar_data)
+        point_bank_at_swar(sbnk, len(swar.waves), packed_wave_ids(swar_path))
+        if old_swar is not None:
+            swar.unk02 = old_swar.unk02
+            swar.dataMergeOptimizationID = old_swar.dataMergeOptimizationID
+            changed = old_swar.save()[0] != swar.save()[0]
+        else:
+            changed = True
+        sdat.waveArchives[swar_index] = (swar_name, swar)
+    elif swar_index < len(sdat.waveArchives) and sdat.waveArchives[swar_index][1] is not None:
+        point_bank_at_swar(sbnk, len(sdat.waveArchives[swar_index][1].waves))
+
+    changed = (changed or old_sbnk.save()[0] != sbnk.save()[0]
+               or list(old_sbnk.waveArchiveIDs) != list(sbnk.waveArchiveIDs))
+    sdat.banks[bank_index] = (bank_name, sbnk)
+
+    label = f"bank #{bank_index}" + (f" ({bank_name})" if bank_name else "")
+    if not changed:
+        log.info(f"SDAT up to date: {label} in {sdat_path}")
+        return False
+    tmp = sdat_path + ".tmp"
+    sdat.saveToFile(tmp)
+    os.replace(tmp, sdat_path)
+    log.info(f"Injected {label}" + (f" and wave archive #{WAVE_ARCHIVE_IDS[0]}" if swar_path else "")
+             + f" into {sdat_path}")
+    return True
+
+# ==========================================
+# PREVIEW RENDERING
+# ==========================================
+
+def preview_voices(inst, sample_index):
+    """The instrument's regions as nds_preview voices, with the fields create_note_def writes to the SBNK."""
+    voices = []
+    for region in inst.regions:
+        voice = {'key_min': region.key_min, 'key_max': region.key_max, 'type': region.note_type,
+                 'root_key': region.root_key, 'attack': region.attack, 'decay': region.decay,
+                 'sustain': region.sustain, 'release': region.release, 'pan': region.pan}
+        if region.note_type == 'pcm':
+            wav_path = sample_index.get(region.wave_id)
+            if not wav_path: continue
+            # The SBNK loops as the SWAV does; the CSV LOOP column overrides it, as in the SF2
+            voice.update(wav_path=wav_path, loop=region.loop)
+        elif region.note_type == 'psg':
+            voice['duty'] = region.wave_id
+        voices.append(voice)
+    return voices
+
+def preview_keys(inst, keys=None):
+    """keys, or by default each region's root key (clamped into the region)."""
+    if keys:
+        return sorted(keys)
+    return sorted({min(max(r.root_key, r.key_min), r.key_max) for r in inst.regions})
+
+def render_previews(bank, sample_index, out_dir, keys=None, jobs=1, report=None):
+    """
+    Renders each instrument at keys (see preview_keys) to 16-bit stereo WAVs
+    in out_dir, on jobs processes, and writes previews.json with their digests.
+    """
+    report = report or BuildReport()
+    if not numpy_available():
+        log.warning("  [Warning] Previews need NumPy (pip install numpy), skipping")
+        return
+    import nds_preview
+
+    with report.stage('preview'):
+        os.makedirs(out_dir, exist_ok=True)
+        tasks = []
+        for inst_id, inst in bank.items():
+            voices = preview_voices(inst, sample_index)
+            if voices:
+                tasks.append((inst_id, inst.name, voices, preview_keys(inst, keys), out_dir, nds_preview.HOLD_MS))
+
+        jobs = max(1, min(jobs, len(tasks)))
+        if jobs == 1:
+            results = list(map(nds_preview.render_instrument, tasks))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(nds_preview.render_instrument, tasks,
+                                        chunksize=max(1, len(tasks) // (jobs * 4))))
+
+        index = {}
+        for inst_id, written, errors in results:
+            for error in errors:
+                log.warning(f"  [Warning] Inst {inst_id}: {error}")
+            for filename, key in written:
+                with open(os.path.join(out_dir, filename), 'rb') as f:
+                    digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+                index[filename] = {'inst': inst_id, 'key': key, 'digest': digest}
+                log.debug(f"     [Info] {filename}")
+        with open(os.path.join(out_dir, PREVIEW_INDEX_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+        # Drop renders of keys or instruments that are gone
+        with os.scandir(out_dir) as entries:
+            stale = [e.path for e in entries if e.is_file() and e.name.endswith(".wav") and e.name not in index]
+        for path in stale:
+            os.remove(path)
+    report.count(previews=len(index))
+    log.info(f"Rendered {len(index)} previews to {out_dir}")
+
+# ==========================================
+# COMMAND LINE / BATCH MODE
+# ==========================================
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to the current sys.stdout, so redirect_stdout also captures log output."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+def configure_logging(level):
+    if not log.handlers:
+        handler = _StdoutHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.propagate = False
+    log.setLevel(level)
+
+def parse_targets(text):
+    """'sbnk,sf2' -> ('sbnk', 'sf2'), in OUTPUT_TARGETS order."""
+    names = {t.strip().lower() for t in text.split(',') if t.strip()}
+    unknown = names - set(OUTPUT_TARGETS)
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"unknown target(s) {', '.join(sorted(unknown)) or text!r}; "
+                                         f"choose from {', '.join(OUTPUT_TARGETS)}")
+    return tuple(t for t in OUTPUT_TARGETS if t in names)
+
+def convert_bank(csv_path, use_cache=BUILD_CACHE, log_level=logging.INFO, trace_memory=False, budget=None,
+                 preview=None, usage=None, targets=OUTPUT_TARGETS):
+    """Batch worker: converts one CSV next to itself. Returns (csv_path, ok, captured output, report dict)."""
+    configure_logging(log_level)
+    output = io.StringIO()
+    report = BuildReport(trace_memory)
+    ok = True
+    with contextlib.redirect_stdout(output):
+        try:
+            base = os.path.splitext(csv_path)[0]
+            parse_csv_to_sbnk_and_sf2(csv_path, base + ".sbnk", base + ".sf2", use_cache, report, budget,
+                                      preview=preview, usage=usage, targets=targets)
+        except Exception:
+            traceback.print_exc(file=output)
+            ok = False
+    return csv_path, ok, output.getvalue(), report.to_dict()
+
+def collect_csv_paths(inputs):
+    """Expands directories (their *.csv files) and glob patterns, keeping order and dropping duplicates."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.csv"))))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def run_batch(csv_paths, jobs, use_cache, log_level, trace_memory, budget=None, preview=None, usage=None,
+              targets=OUTPUT_TARGETS):
+    print(f"Converting {len(csv_paths)} banks with {jobs} worker(s)...")
+    results = {}
+    reports = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(convert_bank, p, use_cache, log_level, trace_memory, budget, preview, usage, targets): p
+                   for p in csv_paths}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                csv_path, ok, output, report = future.result()
+            except Exception as e:
+                # The worker itself died (killed, out of memory): fail this bank, keep the rest
+                csv_path, ok, report = futures[future], False, {'stages': {}, 'counts': {}}
+                output = f"[Error] Worker failed: {e!r}"
+            results[csv_path] = ok
+            reports[csv_path] = dict(report, ok=ok)
+            if output.strip():
+                print(f"\n=== {csv_path} ===")
+                print(output.rstrip())
+
+    failed = [p for p in csv_paths if not results[p]]
+    print("\n" + "=" * 45)
+    for p in csv_paths:
+        print(f"  [{'OK' if results[p] else 'FAILED'}] {p}")
+    print(f"{len(csv_paths) - len(failed)} succeeded, {len(failed)} failed")
+    return (1 if failed else 0), {p: reports[p] for p in csv_paths}
+
+def write_report(path, banks):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'banks': banks}, f, indent=1)
+    print(f"Report written to {path}")
+
+def watch_snapshot(csv_path):
+    """Stamps of the CSV and of every NN_name.wav in its Samples folder."""
+    try:
+        csv_stamp = file_stamp(csv_path)
+    except OSError:
+        csv_stamp = None
+    waves = []
+    samples_dir = os.path.join(os.path.dirname(csv_path), "Samples")
+    if os.path.isdir(samples_dir):
+        with os.scandir(samples_dir) as entries:
+            for e in entries:
+                if e.is_file() and WAVE_FILE_PATTERN.match(e.name):
+                    st = e.stat()
+                    waves.append((e.name, st.st_size, st.st_mtime_ns))
+    return csv_stamp, sorted(waves)
+
+def describe_rebuild(report):
+    parts = []
+    if 'sbnk_save' in report.stages:
+        changed = report.counts.get('changed_instruments')
+        parts.append("SBNK rebuilt" + (f" (instruments {', '.join(map(str, changed))})" if changed else ""))
+    if 'sf2_sdta' in report.stages:
+        parts.append(f"SF2 rebuilt ({report.counts.get('samples_read', 0)} WAV(s) read from disk)")
+    if report.counts.get('sdat_updated'):
+        parts.append("SDAT updated")
+    return ", ".join(parts) or "up to date"
+
+def watch(csv_paths, use_cache=BUILD_CACHE, budget=None, interval=WATCH_INTERVAL, cache_mb=SAMPLE_CACHE_MB,
+          usage=None, sdat=None, targets=OUTPUT_TARGETS):
+    """Rebuilds each bank whenever its CSV or Samples folder changes, until Ctrl+C."""
+    sample_cache = SampleCache(cache_mb * 1024 * 1024)
+    snapshots = {}
+    print(f"Watching {len(csv_paths)} bank(s), press Ctrl+C to stop...")
+    try:
+        while True:
+            for csv_path in csv_paths:
+                snapshot = watch_snapshot(csv_path)
+                if snapshot == snapshots.get(csv_path): continue
+                snapshots[csv_path] = snapshot
+                now = datetime.datetime.now().strftime("%H:%M:%S")
+                name = os.path.basename(csv_path)
+                if snapshot[0] is None:
+                    print(f"[{now}] {name}: not found, waiting...")
+                    continue
+
+                base = os.path.splitext(csv_path)[0]
+                report = BuildReport()
+                start = time.perf_counter()
+                try:
+                    parse_csv_to_sbnk_and_sf2(csv_path, base + ".sbnk", base + ".sf2", use_cache, report, budget,
+                                              sample_cache, usage=usage, sdat=sdat, targets=targets)
+                except Exception as e:
+                    print(f"[{now}] {name}: FAILED: {e}")
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[{now}] {name}: {describe_rebuild(report)} in {elapsed:.1f} ms"
+                      f" (cache {sample_cache.size / (1024 * 1024):.1f} MB)")
+            # --force only applies to the first build
+            use_cache = BUILD_CACHE
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    return 0
+
+def main(argv=None):
+    import nds_budget  # for the --wave-format and --min-rate defaults
+
+    parser = argparse.ArgumentParser(description="Convert instrument CSV banks to SBNK + SF2.")
+    parser.add_argument("inputs", nargs="*", help="CSV files, folders of CSVs or glob patterns "
+                        "(legacy form: CSV SBNK_OUT SF2_OUT)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for batch mode (default: CPU count)")
+    parser.add_argument("--batch", action="store_true", help="never prompt, even for a single CSV")
+    parser.add_argument("--force", action="store_true", help="ignore the build cache and rebuild everything")
+    parser.add_argument("--targets", type=parse_targets, default=OUTPUT_TARGETS, metavar="LIST",
+                        help=f"comma-separated outputs to build: {', '.join(OUTPUT_TARGETS)} (default: all)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per-stage timings and peak memory (slower: traces allocations)")
+    parser.add_argument("--report", metavar="JSON", help="write per-stage timings and counts to a JSON file")
+    parser.add_argument("--sizes", action="store_true",
+                        help="report each wave's SWAR size as PCM16/PCM8/ADPCM")
+    parser.add_argument("--budget", type=parse_byte_size, metavar="BYTES",
+                        help=f"resample waves so the SWAR fits BYTES (e.g. 400K), into <bank>{BUDGET_SAMPLES_DIR_SUFFIX}/")
+    parser.add_argument("--wave-format", choices=nds_budget.FORMATS, default=BUDGET_FORMAT,
+                        help=f"SWAV encoding the budget is measured in (default: {BUDGET_FORMAT})")
+    parser.add_argument("--resample", metavar="IDS", type=lambda v: {int(i) for i in v.split(',') if i.strip()},
+                        help="comma-separated WaveIDs --budget may resample (default: all)")
+    parser.add_argument("--min-rate", type=int, default=nds_budget.DEFAULT_MIN_RATE,
+                        help=f"never resample below this rate (default: {nds_budget.DEFAULT_MIN_RATE} Hz)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild whenever the CSV or its Samples change")
+    parser.add_argument("--cache-mb", type=int, default=SAMPLE_CACHE_MB,
+                        help=f"memory cap for samples kept between --watch rebuilds (default: {SAMPLE_CACHE_MB})")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"render every instrument to WAVs in <bank>{PREVIEW_DIR_SUFFIX}/ (needs NumPy)")
+    parser.add_argument("--preview-keys", metavar="KEYS", type=lambda v: {int(k) for k in v.split(',') if k.strip()},
+                        help="comma-separated MIDI keys to render (default: each region's RootKey)")
+    parser.add_argument("--midi", action="append", metavar="SONGS",
+                        help="only emit instruments, splits and keys these MIDI files play "
+                             "(file, folder or pattern; repeatable)")
+    parser.add_argument("--sdat", metavar="SDAT", help="also replace a bank inside this SDAT (single CSV only)")
+    parser.add_argument("--bank", metavar="NAME_OR_ID", help="the SDAT bank to replace, by symbol name or number")
+    parser.add_argument("--swar", metavar="SWAR",
+                        help="also replace wave archive WAVE_ARCHIVE_IDS[0] in the SDAT with this .swar")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="show per-instrument/per-sample lines")
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="only show warnings and errors")
+    args = parser.parse_args(argv)
+    use_cache = BUILD_CACHE and not args.force
+    # Keep a drag-and-drop console window open; never block scripted runs
+    pause = not args.batch and sys.stdin.isatty()
+    if (args.bank or args.swar) and not args.sdat:
+        parser.error("--bank and --swar need --sdat")
+    if args.sdat and not args.bank:
+        parser.error("--sdat needs --bank")
+    budget = None
+    if args.sizes or args.budget:
+        budget = {'bytes': args.budget, 'format': args.wave_format, 'waves': args.resample, 'min_rate': args.min_rate}
+
+    csv_paths = collect_csv_paths(args.inputs)
+    # Legacy explicit output paths: CSV SBNK_OUT SF2_OUT
+    legacy = len(args.inputs) == 3 and args.inputs[1].lower().endswith('.sbnk') and args.inputs[2].lower().endswith('.sf2')
+    # --batch only drops the Enter prompt: one named CSV still builds in-process, so --sdat works
+    single = legacy or (len(csv_paths) == 1
+                        and not any(os.path.isdir(i) or glob.has_magic(i) for i in args.inputs))
+
+    # Single drag-and-drop runs keep the full per-item output; batch runs show milestones only,
+    # watch mode just its one line per rebuild
+    default_level = logging.WARNING if args.watch else logging.DEBUG if single else logging.INFO
+    log_level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else default_level
+    configure_logging(log_level)
+
+    if not csv_paths:
         print("Usage: Drag CSV file onto script")
-    input("Press Enter to exit...")
+        if pause: input("Press Enter to exit...")
+        return 1
+
+    usage = None
+    if args.midi:
+        import midi_usage
+        try:
+            usage = midi_usage.load_usage(args.midi)
+        except (OSError, ValueError) as e:
+            print(f"[!] Could not read MIDI files: {e}")
+            if pause: input("Press Enter to exit...")
+            return 1
+        log.info("\n".join(usage.summary_lines()))
+
+    sdat = {'path': args.sdat, 'bank': args.bank, 'swar': args.swar} if args.sdat else None
+    if sdat and not single:
+        print("[!] --sdat works with a single CSV")
+        if pause: input("Press Enter to exit...")
+        return 1
+    if ('sbnk' in args.targets or sdat) and importlib.util.find_spec('ndspy') is None:
+        print("CRITICAL ERROR: NDSpy is required for SBNK output.")
+        print("Please open cmd/terminal and run: pip install ndspy (or use --targets sf2)")
+        if pause: input("Press Enter to exit...")
+        return 1
+
+    if args.watch:
+        return watch(csv_paths, use_cache, budget, cache_mb=args.cache_mb, usage=usage, sdat=sdat,
+                     targets=args.targets)
+
+    if single:
+        csv_path = args.inputs[0] if legacy else csv_paths[0]
+        base = os.path.splitext(csv_path)[0]
+        outputs = args.inputs[1:] if legacy else [base + ".sbnk", base + ".sf2"]
+        preview = {'keys': args.preview_keys, 'jobs': max(1, args.jobs)} if args.preview else None
+        report = parse_csv_to_sbnk_and_sf2(csv_path, outputs[0], outputs[1], use_cache,
+                                           BuildReport(args.profile), budget, preview=preview, usage=usage,
+                                           sdat=sdat, targets=args.targets)
+        if args.profile:
+            print("\n".join(report.summary_lines()))
+        if args.report:
+            write_report(args.report, {os.path.abspath(csv_path): dict(report.to_dict(), ok=True)})
+        if pause: input("Press Enter to exit...")
+        return 0
+
+    # Banks already run in parallel, so each renders its previews in its own worker
+    preview = {'keys': args.preview_keys, 'jobs': 1} if args.preview else None
+    status, reports = run_batch(csv_paths, max(1, min(args.jobs, len(csv_paths))), use_cache, log_level,
+                                args.profile, budget, preview, usage, args.targets)
+    if args.profile:
+        for csv_path, report in reports.items():
+            print(f"\n{csv_path}")
+            for name, entry in report['stages'].items():
+                peak = f"  peak {entry['peak_bytes'] / 1024:.1f} KB" if 'peak_bytes' in entry else ""
+                print(f"  {name:<14} {entry['seconds'] * 1000:>10.2f} ms{peak}")
+    if args.report:
+        write_report(args.report, reports)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
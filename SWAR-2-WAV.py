@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+SWAR to WAV Extractor
+Dumps every wave of an NDS .swar (or of every wave archive in an .sdat) to
+16-bit WAVs named for their WaveID, so an existing game bank can seed a
+CSV-2-SBNK Samples folder. PCM8, PCM16 and IMA-ADPCM waves are decoded on all
+CPU cores; looped waves get a 'smpl' chunk at the SWAV loop points, which
+WAV-2-SWAV reads back unchanged.
+
+Usage: SWAR-2-WAV.py [SWAR/SDAT files / folders / patterns] [-o OUT_DIR]
+Each archive goes to <name>/Samples next to it (or under OUT_DIR), as
+00_<name>.wav, 01_<name>.wav, ...
+"""
+
+import sys
+import os
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import re
+import traceback
+
+# --- Dependency Check ---
+try:
+    import numpy as np
+    import ndspy.soundArchive
+    import ndspy.soundWaveArchive
+    from ndspy.soundWave import WaveType
+except ImportError:
+    print("CRITICAL ERROR: NumPy and NDSpy are required.")
+    print("Please open cmd/terminal and run: pip install numpy ndspy")
+    input("Press Enter to exit...")
+    sys.exit(1)
+
+import nds_adpcm
+from wav_io import sanitize_loop, write_wav16
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+ARCHIVE_EXTENSIONS = (".swar", ".sdat")
+SAMPLES_DIR = "Samples"
+# Samples per 32-bit word; SWAV loop offsets and lengths are counted in words
+SAMPLES_PER_WORD = {
+    WaveType.PCM8: 4,
+    WaveType.PCM16: 2,
+    WaveType.ADPCM: 8,
+}
+
+# ==========================================
+# DECODING
+# ==========================================
+def decode_frames(data, wave_type):
+    """SWAV data to int16 mono frames."""
+    if wave_type == WaveType.PCM16:
+        return np.frombuffer(data, '<i2', len(data) // 2).astype(np.int16)
+    if wave_type == WaveType.PCM8:
+        return np.frombuffer(data, np.int8).astype(np.int16) << 8
+    return nds_adpcm.decode(data)
+
+def wave_loop(wave_type, is_looped, loop_offset, n_frames):
+    """SWAV loop offset (in words) to a 'smpl' loop (start, inclusive end), or None."""
+    if not is_looped or not n_frames:
+        return None
+    # The ADPCM header occupies the first word, so the loop offset is one word late
+    header_words = nds_adpcm.HEADER_SIZE // 4 if wave_type == WaveType.ADPCM else 0
+    loop_start = max(0, loop_offset - header_words) * SAMPLES_PER_WORD[wave_type]
+    return sanitize_loop((loop_start, n_frames - 1), n_frames)
+
+def extract_wave(task):
+    """Pool worker: decodes one SWAV into a WAV. Returns (wav_path, ok, message)."""
+    wav_path, wave_type, is_looped, sample_rate, loop_offset, data = task
+    try:
+        if wave_type not in SAMPLES_PER_WORD:
+            return wav_path, False, f"Unknown wave type {wave_type}"
+        if not sample_rate:
+            return wav_path, False, "Sample rate is 0"
+        frames = decode_frames(data, wave_type)
+        loop = wave_loop(wave_type, is_looped, loop_offset, len(frames))
+        write_wav16(wav_path, frames, sample_rate, loop)
+        loop_text = f"loop {loop[0]}-{loop[1]}" if loop else "no loop"
+        return wav_path, True, f"{WaveType(wave_type).name}, {sample_rate} Hz, {len(frames)} samples, {loop_text}"
+    except Exception:
+        return wav_path, False, traceback.format_exc()
+
+# ==========================================
+# ARCHIVES
+# ==========================================
+def load_archives(path):
+    """[(name, SWAR)]: the file itself for a .swar, every wave archive for an .sdat."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith(".sdat"):
+        sdat = ndspy.soundArchive.SDAT.fromFile(path)
+        return [(os.path.join(stem, name or f"WAVE_{i:03d}"), swar)
+                for i, (name, swar) in enumerate(sdat.waveArchives) if swar is not None]
+    return [(stem, ndspy.soundWaveArchive.SWAR.fromFile(path))]
+
+def wave_tasks(swar, samples_dir, name):
+    """One extract_wave task per wave; the file name prefix is the WaveID."""
+    os.makedirs(samples_dir, exist_ok=True)
+    label = re.sub(r'[^0-9A-Za-z_-]+', '_', os.path.basename(name)).strip('_')
+    return [(os.path.join(samples_dir, f"{wave_id:02d}_{label}.wav"), int(wave.waveType),
+             wave.isLooped, wave.sampleRate, wave.loopOffset, bytes(wave.data))
+            for wave_id, wave in enumerate(swar.waves)]
+
+# ==========================================
+# COMMAND LINE / BATCH MODE
+# ==========================================
+def collect_archive_paths(inputs):
+    """Expands directories (their *.swar/*.sdat files) and glob patterns, keeping order and dropping duplicates."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(e.path for e in os.scandir(item)
+                                if e.is_file() and e.name.lower().endswith(ARCHIVE_EXTENSIONS)))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the waves of NDS .swar/.sdat files to .wav.")
+    parser.add_argument("inputs", nargs="*", help="SWAR/SDAT files, folders or glob patterns (default: this script's folder)")
+    parser.add_argument("-o", "--output-dir", help="write <archive>/Samples folders here instead of next to each archive")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--batch", action="store_true", help="don't wait for Enter at the end")
+    args = parser.parse_args(argv)
+    # Keep a double-clicked console window open; never block scripted runs
+    pause = not args.batch and sys.stdin.isatty()
+
+    archive_paths = collect_archive_paths(args.inputs or [os.path.dirname(os.path.abspath(__file__))])
+    if not archive_paths:
+        print("[!] No .swar or .sdat files found.")
+        if pause: input("Press Enter to exit...")
+        return 1
+
+    print("--- SWAR to WAV Extractor ---")
+    bad_archives = 0
+    groups = []
+    for path in archive_paths:
+        try:
+            archives = load_archives(path)
+        except Exception as e:
+            bad_archives += 1
+            print(f"  [FAILED] {os.path.basename(path)}: {e}")
+            continue
+        for name, swar in archives:
+            samples_dir = os.path.join(args.output_dir or os.path.dirname(path), name, SAMPLES_DIR)
+            groups.append((name, samples_dir, wave_tasks(swar, samples_dir, name)))
+
+    tasks = [task for _, _, group in groups for task in group]
+    jobs = max(1, min(args.jobs, len(tasks)))
+    print(f"Extracting {len(tasks)} waves from {len(groups)} archive(s) with {jobs} worker(s)...")
+    print("-" * 45)
+
+    failed = 0
+    with contextlib.ExitStack() as stack:
+        if jobs == 1:
+            results = map(extract_wave, tasks)
+        else:
+            pool = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=jobs))
+            # Many short waves: hand them out in chunks to keep IPC overhead low
+            results = pool.map(extract_wave, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+
+        # One line per archive; only failed waves are listed individually
+        for name, samples_dir, group in groups:
+            errors = []
+            for _ in group:
+                wav_path, ok, message = next(results)
+                if not ok:
+                    errors.append(f"    [FAILED] {os.path.basename(wav_path)}: {message}")
+            failed += len(errors)
+            print(f"  [{'OK' if not errors else 'WARNING'}] {name}: {len(group) - len(errors)} waves -> {samples_dir}")
+            for line in errors:
+                print(line)
+
+    print("-" * 45)
+    print(f"{len(tasks) - failed} extracted, {failed} failed"
+          + (f", {bad_archives} archive(s) unreadable" if bad_archives else ""))
+    if pause: input("Done. Press Enter to exit...")
+    return 1 if failed or bad_archives else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
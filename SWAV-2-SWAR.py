@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
 """
 SWAV to SWAR Bundler - Numerical Indexing
-Sorts files based on the leading number (e.g., 0_, 1_, 10_) 
+Sorts files based on the leading number (e.g., 0_, 1_, 10_)
 to ensure the SWAR index matches your SBNK definitions.
+
+Usage: SWAV-2-SWAR.py [INPUT_DIR] [-o OUTPUT.swar] [--sbnk BANK.sbnk ...]
+With no arguments it bundles the folder containing the script, as before.
+With --sbnk, only the waves those banks play are packed, and the banks'
+WaveIDs are rewritten to the compacted SWAR indices.
 """
 
 import sys
 import os
+import argparse
+import concurrent.futures
+import hashlib
+import json
 from pathlib import Path
 import re
 
 # --- Dependency Check ---
 try:
+    import ndspy.soundBank
     import ndspy.soundWave
     import ndspy.soundWaveArchive
 except ImportError:
@@ -20,67 +30,333 @@ except ImportError:
     input("Press Enter to exit...")
     sys.exit(1)
 
-def main():
-    current_folder = Path(__file__).parent.resolve()
-    folder_name = current_folder.name
-    output_filename = current_folder / f"newSND-bank.swar" # Matches your screenshot name
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_OUTPUT_NAME = "newSND-bank.swar"  # Matches your screenshot name
+# Skip repacking when the SWAVs are unchanged since the last run (see <output>.build.json)
+BUILD_CACHE = True
+BUILD_MANIFEST_SUFFIX = ".build.json"
+MANIFEST_VERSION = 1
+# Reading is I/O bound, so threads overlap file reads
+LOAD_THREADS = min(32, (os.cpu_count() or 1) + 4)
+# SBNK wave archive slot this SWAR fills (CSV-2-SBNK puts every PCM note in slot 0)
+ARCHIVE_SLOT = 0
+# A .swav file is a 0x24-byte header + data; inside a SWAR a wave costs an offset and a 12-byte info block
+SWAV_FILE_OVERHEAD = 0x24
+SWAR_WAVE_OVERHEAD = 4 + 12
 
-    print(f"--- SWAV to SWAR Bundler (Fixed Indexing) ---")
-    print(f"Working directory: {current_folder}")
+# ==========================================
+# DISCOVERY & LOADING
+# ==========================================
+def get_leading_number(path):
+    """Extracts the first group of digits from the filename (no number sorts last)."""
+    match = re.search(r'^(\+?\d+)', path.name)
+    return int(match.group(1)) if match else 999
+
+def find_swav_files(folder):
+    """All .swav files in folder, sorted by actual integer value (10 comes AFTER 2), then name."""
+    swav_files = [Path(e.path) for e in os.scandir(folder)
+                  if e.is_file() and e.name.lower().endswith(".swav")]
+    swav_files.sort(key=lambda p: (get_leading_number(p), p.name))
+    return swav_files
+
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def load_swav(path):
+    """Reads one SWAV. Returns (swav, digest, stamp); the digest covers the exact file bytes."""
+    stamp = file_stamp(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return ndspy.soundWave.SWAV(data), digest, stamp
+
+# ==========================================
+# BUILD MANIFEST
+# ==========================================
+def load_manifest(output_path):
+    try:
+        with open(str(output_path) + BUILD_MANIFEST_SUFFIX, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_manifest(output_path, waves, banks=None, wave_ids=None):
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'output': file_stamp(output_path),
+        'waves': waves,
+    }
+    if wave_ids is not None:
+        # Folder indices of the packed waves
+        manifest['wave_ids'] = wave_ids
+    if banks:
+        # Banks compacted by this or an earlier run, with the folder indices each points at
+        manifest['banks'] = banks
+    try:
+        with open(str(output_path) + BUILD_MANIFEST_SUFFIX, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+    except OSError as e:
+        print(f"    [!] Could not write build manifest: {e}")
+
+def output_is_current(manifest, output_path):
+    """True if the archive on disk is the one this manifest was written for."""
+    return (manifest is not None and output_path.exists()
+            and manifest.get('output') == file_stamp(output_path))
+
+def stamps_unchanged(manifest, swav_files):
+    """Cheap check: same files, same order, same size/mtime. No file contents are read."""
+    entries = manifest.get('waves', [])
+    if len(entries) != len(swav_files):
+        return False
+    return all(e['name'] == f.name and e['stamp'] == file_stamp(f) for e, f in zip(entries, swav_files))
+
+# ==========================================
+# BANK REFERENCES (--sbnk)
+# ==========================================
+def note_definitions(sbnk):
+    for inst in sbnk.instruments:
+        if isinstance(inst, ndspy.soundBank.SingleNoteInstrument):
+            yield inst.noteDefinition
+        elif isinstance(inst, ndspy.soundBank.RangeInstrument):
+            yield from inst.noteDefinitions
+        elif isinstance(inst, ndspy.soundBank.RegionalInstrument):
+            for region in inst.regions:
+                yield region.noteDefinition
 
+def archive_notes(sbnk):
+    """PCM note definitions that play from this SWAR."""
+    return [nd for nd in note_definitions(sbnk)
+            if nd.type == ndspy.soundBank.NoteType.PCM and nd.waveArchiveIDID == ARCHIVE_SLOT]
+
+def load_banks(sbnk_paths, manifest):
+    """
+    Reads each SBNK with its WaveIDs as SWAV folder indices. A bank this
+    script already compacted (its stamp is in the manifest) is mapped back
+    through the wave list it was compacted against, so re-runs are stable.
+    Returns [(path, sbnk, that wave list or None)].
+    """
+    compacted = {b['path']: b for b in (manifest or {}).get('banks', [])}
+    banks = []
+    for path in sbnk_paths:
+        sbnk = ndspy.soundBank.SBNK.fromFile(str(path))
+        entry = compacted.get(str(path))
+        old_ids = None
+        if entry is not None and entry['stamp'] == file_stamp(path):
+            # Older manifests kept one list for every bank
+            old_ids = entry.get('wave_ids', manifest.get('wave_ids', []))
+            for nd in archive_notes(sbnk):
+                if nd.waveID >= len(old_ids):
+                    raise ValueError(f"{path.name} does not match the WaveIDs it was compacted to")
+                nd.waveID = old_ids[nd.waveID]
+        banks.append((path, sbnk, old_ids))
+    return banks
+
+def prune_to_banks(swav_files, banks):
+    """
+    The folder indices the banks play, sorted. Prints what each bank uses and
+    what pruning saves, per bank and in total. Returns None if a bank plays a
+    wave the folder lacks.
+    """
+    # Bytes each wave takes inside the SWAR
+    sizes = [os.path.getsize(f) - SWAV_FILE_OVERHEAD + SWAR_WAVE_OVERHEAD for f in swav_files]
+    wave_ids = set()
+    for path, sbnk, _ in banks:
+        used = {nd.waveID for nd in archive_notes(sbnk)}
+        missing = sorted(i for i in used if i >= len(swav_files))
+        if missing:
+            print(f"    [!] {path.name} plays WaveID(s) {', '.join(map(str, missing))}, "
+                  f"but there are only {len(swav_files)} .swav files")
+            return None
+        bank_saved = sum(size for i, size in enumerate(sizes) if i not in used)
+        print(f"{path.name}: {len(used)} waves referenced, {len(swav_files) - len(used)} unused "
+              f"(pruning saves {bank_saved} bytes for this bank alone)")
+        wave_ids |= used
+
+    unused = [i for i in range(len(swav_files)) if i not in wave_ids]
+    saved = sum(sizes[i] for i in unused)
+    print(f"Pruned {len(unused)} of {len(swav_files)} waves (not referenced), saving {saved} bytes")
+    return sorted(wave_ids)
+
+def rewrite_banks(banks, wave_ids, previous):
+    """
+    Points each bank not yet compacted to wave_ids at the compacted SWAR.
+    Returns the manifest's bank entries: these banks, plus the ones earlier
+    runs compacted, so a later run can still map those back.
+    """
+    new_index = {wave_id: i for i, wave_id in enumerate(wave_ids)}
+    old = {b['path']: b for b in (previous or {}).get('banks', [])}
+    entries = []
+    for path, sbnk, old_ids in banks:
+        old.pop(str(path), None)
+        if old_ids != wave_ids:
+            for nd in archive_notes(sbnk):
+                nd.waveID = new_index[nd.waveID]
+            sbnk.saveToFile(str(path))
+            print(f"Rewrote WaveIDs in {path.name}")
+        entries.append({'path': str(path), 'stamp': file_stamp(path), 'wave_ids': wave_ids})
+    return entries + list(old.values())
+
+def restore_banks(previous):
+    """
+    Points the banks earlier runs compacted back at SWAV folder indices, for
+    an archive packed without --sbnk. Banks changed since (e.g. rebuilt from
+    their CSV) already use folder indices and are left alone.
+    """
+    for entry in (previous or {}).get('banks', []):
+        path = Path(entry['path'])
+        if not path.exists():
+            continue
+        try:
+            [(_, sbnk, old_ids)] = load_banks([path], previous)
+            if old_ids is not None:
+                sbnk.saveToFile(str(path))
+                print(f"Restored folder WaveIDs in {path.name}")
+        except Exception as e:
+            print(f"    [!] Could not restore the WaveIDs in {path.name} ({e}): "
+                  f"rebuild it from its CSV, it no longer matches this archive")
+
+# ==========================================
+# BUNDLING
+# ==========================================
+def bundle(input_folder, output_filename, use_cache=BUILD_CACHE, jobs=LOAD_THREADS, sbnk_paths=()):
+    """
+    Packs every .swav in input_folder into output_filename, or with sbnk_paths
+    only the ones those banks play (see prune_to_banks). Returns True on success.
+    """
     # 1. Find all .swav files
-    swav_files = list(current_folder.glob("*.swav"))
+    swav_files = find_swav_files(input_folder)
 
     if not swav_files:
         print("\n[!] No .swav files found in this folder.")
-    else:
-        # 2. Numerical Sort Logic
-        # This function extracts the first group of digits from the filename
-        def get_leading_number(path):
-            match = re.search(r'^(\+?\d+)', path.name)
-            return int(match.group(1)) if match else 999
-
-        # Sort based on the actual integer value (10 comes AFTER 2)
-        swav_files.sort(key=get_leading_number)
-        
-        print(f"\nSorting {len(swav_files)} files by leading number...")
-        print("-" * 45)
-        print(f"{'INDEX':<8} | {'FILENAME':<25}")
-        print("-" * 45)
+        return False
 
-        swav_objects = []
-        loaded_count = 0
+    # The bank list is needed to undo an earlier compaction even when the cache is off
+    previous = load_manifest(output_filename)
+    banks = wave_ids = None
+    if sbnk_paths:
+        try:
+            banks = load_banks(sbnk_paths, previous)
+        except Exception as e:
+            print(f"\n[!] Error reading SBNK: {e}")
+            return False
+        wave_ids = prune_to_banks(swav_files, banks)
+        if wave_ids is None:
+            return False
+        swav_files = [swav_files[i] for i in wave_ids]
+    manifest = previous if use_cache else None
 
-        # 3. Load files and print verification table
-        for i, f in enumerate(swav_files):
+    if (output_is_current(manifest, output_filename) and stamps_unchanged(manifest, swav_files)
+            and (not banks or (all(old_ids == wave_ids for _, _, old_ids in banks)
+                               and manifest.get('wave_ids') == wave_ids))):
+        print(f"\n[UP TO DATE] {output_filename.name} ({len(swav_files)} waves unchanged, skipped repack)")
+        return True
+
+    # 2. Numerical Sort Logic (done by find_swav_files)
+    print(f"\nSorting {len(swav_files)} files by leading number...")
+    print("-" * 45)
+    print(f"{'INDEX':<8} | {'FILENAME':<25}")
+    print("-" * 45)
+
+    # 3. Load files concurrently; results come back in sorted order
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(load_swav, f) for f in swav_files]
+
+        swav_objects = []
+        waves = []
+        for f, future in zip(swav_files, futures):
             try:
-                # This visual check ensures your SBNK links will work
-                print(f"SWAR[{i}]   <-- {f.name}")
-                
-                swav = ndspy.soundWave.SWAV.fromFile(str(f))
-                swav_objects.append(swav)
-                loaded_count += 1
+                swav, digest, stamp = future.result()
             except Exception as e:
                 print(f"    [!] Failed to load {f.name}: {e}")
+                continue
+            # This visual check ensures your SBNK links will work
+            source = f" (WaveID {wave_ids[len(swav_objects)]})" if wave_ids is not None else ""
+            print(f"SWAR[{len(swav_objects)}]   <-- {f.name}{source}")
+            swav_objects.append(swav)
+            waves.append({'name': f.name, 'stamp': stamp, 'digest': digest})
 
-        # 4. Save SWAR
-        if loaded_count > 0:
-            try:
-                print("-" * 45)
-                print(f"Packing {loaded_count} waves into archive...")
-                
-                swar = ndspy.soundWaveArchive.SWAR.fromWaves(swav_objects)
-                swar.saveToFile(str(output_filename))
-                
-                print(f"\n[SUCCESS] Created: {output_filename.name}")
-                print(f"Your SBNK instruments should now map correctly to these IDs.")
-            except Exception as e:
-                print(f"\n[!] Error saving SWAR file: {e}")
-        else:
-            print("\n[!] No valid files to create archive.")
+    if not swav_objects:
+        print("\n[!] No valid files to create archive.")
+        return False
+    if wave_ids is not None and len(swav_objects) != len(wave_ids):
+        # Compacted indices would shift onto the wrong waves
+        print("\n[!] Some referenced waves failed to load, not packing.")
+        return False
+
+    # Files were touched but their bytes and order are the same as last time
+    if (output_is_current(manifest, output_filename)
+            and [(w['name'], w['digest']) for w in waves] ==
+                [(w['name'], w['digest']) for w in manifest.get('waves', [])]):
+        print("-" * 45)
+        print(f"\n[UP TO DATE] {output_filename.name} (contents unchanged, skipped repack)")
+        save_bundle_manifest(output_filename, waves, banks, wave_ids, previous)
+        return True
+
+    # 4. Save SWAR
+    try:
+        print("-" * 45)
+        print(f"Packing {len(swav_objects)} waves into archive...")
+
+        swar = ndspy.soundWaveArchive.SWAR.fromWaves(swav_objects)
+        swar.saveToFile(str(output_filename))
+
+        print(f"\n[SUCCESS] Created: {output_filename.name}")
+        print(f"Your SBNK instruments should now map correctly to these IDs.")
+    except Exception as e:
+        print(f"\n[!] Error saving SWAR file: {e}")
+        return False
+
+    save_bundle_manifest(output_filename, waves, banks, wave_ids, previous)
+    return True
+
+def save_bundle_manifest(output_filename, waves, banks, wave_ids, previous):
+    """
+    Rewrites the banks (if any) for the packed archive, then records both.
+    Without --sbnk the archive holds every wave, so banks compacted by
+    earlier runs are restored to folder indices and dropped from the manifest.
+    """
+    if banks:
+        save_manifest(output_filename, waves, rewrite_banks(banks, wave_ids, previous), wave_ids)
+        return
+    restore_banks(previous)
+    if BUILD_CACHE or (previous or {}).get('banks'):
+        save_manifest(output_filename, waves)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bundle numbered .swav files into a SWAR.")
+    parser.add_argument("input_dir", nargs="?", help="folder with the .swav files (default: this script's folder)")
+    parser.add_argument("-o", "--output", help=f"output .swar path (default: INPUT_DIR/{DEFAULT_OUTPUT_NAME})")
+    parser.add_argument("-j", "--jobs", type=int, default=LOAD_THREADS, help="threads used to read SWAVs")
+    parser.add_argument("--sbnk", action="append", default=[], metavar="BANK",
+                        help="only pack the waves this .sbnk plays and compact its WaveIDs (repeatable)")
+    parser.add_argument("--force", action="store_true", help="always repack, ignoring the build manifest")
+    parser.add_argument("--batch", action="store_true", help="don't wait for Enter at the end")
+    args = parser.parse_args(argv)
+    # Keep a double-clicked console window open; never block scripted runs
+    pause = not args.batch and sys.stdin.isatty()
+
+    current_folder = Path(args.input_dir).resolve() if args.input_dir else Path(__file__).parent.resolve()
+    output_filename = Path(args.output).resolve() if args.output else current_folder / DEFAULT_OUTPUT_NAME
+
+    print(f"--- SWAV to SWAR Bundler (Fixed Indexing) ---")
+    print(f"Working directory: {current_folder}")
+
+    if not current_folder.is_dir():
+        print(f"\n[!] Input folder not found: {current_folder}")
+        ok = False
+    else:
+        ok = bundle(current_folder, output_filename, BUILD_CACHE and not args.force, args.jobs,
+                    [Path(p).resolve() for p in args.sbnk])
 
     print("\n" + "="*45)
-    input("Done. Press Enter to exit...")
+    if pause: input("Done. Press Enter to exit...")
+    return 0 if ok else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+WAV to SWAV Encoder
+Converts .wav files to NDS .swav (IMA-ADPCM, PCM8 or PCM16) on all CPU cores.
+Loop points come from the 'smpl' chunk, the same ones CSV-2-SBNK reads,
+and are aligned to the 32-bit words the hardware loops on.
+
+Usage: WAV-2-SWAV.py [WAV files / folders / patterns] [-f adpcm|pcm8|pcm16] [-o OUT_DIR]
+With no arguments it converts every .wav in the script's folder, like the old
+waveconv-batch.ps1 did.
+"""
+
+import sys
+import os
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import traceback
+
+# --- Dependency Check ---
+try:
+    import numpy as np
+    import ndspy.soundWave
+    from ndspy.soundWave import WaveType
+except ImportError:
+    print("CRITICAL ERROR: NumPy and NDSpy are required.")
+    print("Please open cmd/terminal and run: pip install numpy ndspy")
+    input("Press Enter to exit...")
+    sys.exit(1)
+
+import nds_adpcm
+from wav_io import WavFile, sanitize_loop, to_mono16
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_FORMAT = "adpcm"  # waveconv -a
+WAVE_TYPES = {
+    "adpcm": WaveType.ADPCM,
+    "pcm8": WaveType.PCM8,
+    "pcm16": WaveType.PCM16,
+}
+# Samples per 32-bit word; SWAV loop offsets and lengths are counted in words
+SAMPLES_PER_WORD = {
+    WaveType.PCM8: 4,
+    WaveType.PCM16: 2,
+    WaveType.ADPCM: 8,
+}
+# SWAV 'time' field: hardware timer value for the sample rate
+TIMER_CLOCK = 16756991
+MAX_SAMPLE_RATE = 0xFFFF
+# SWAV loop offset is a 16-bit word count
+MAX_LOOP_OFFSET = 0xFFFF
+
+# ==========================================
+# ENCODING
+# ==========================================
+def read_wav(wav_path):
+    """Returns (int16 mono frames, sample_rate, (loop_start, loop_end) or None)."""
+    with WavFile(wav_path) as wav:
+        frames = to_mono16(wav)
+        sample_rate = wav.sample_rate
+        loop = wav.loops[0] if wav.loops else None
+
+    if loop is not None:
+        # Same sanity rules as read_wav_sample in CSV-2-SBNK
+        loop = sanitize_loop(loop, len(frames))
+    return frames, sample_rate, loop
+
+def align_frames(frames, loop, align):
+    """
+    Pads frames so their count (and the loop start) fall on word boundaries.
+    loop is (start, end) with an inclusive end, as in the 'smpl' chunk.
+    The loop start is moved forward by prepending silence; a loop length that
+    is not a whole number of words is extended with the first samples of the
+    loop, so the wrap stays continuous. Frames after the loop end are never
+    played and are dropped. Returns (frames, loop_start or None).
+    """
+    if loop is None:
+        pad_end = (-len(frames)) % align
+        return np.concatenate([frames, np.zeros(pad_end, np.int16)]), None
+
+    loop_start, loop_end = loop
+    pad_front = (-loop_start) % align
+    body = np.concatenate([np.zeros(pad_front, np.int16), frames[:loop_end + 1]])
+    loop_start += pad_front
+    pad_end = (-(len(body) - loop_start)) % align
+    tail = np.resize(body[loop_start:], pad_end)
+    return np.concatenate([body, tail]), loop_start
+
+def encode_frames(frames, wave_type):
+    if wave_type == WaveType.PCM16:
+        return frames.astype('<i2').tobytes()
+    if wave_type == WaveType.PCM8:
+        return np.clip((frames.astype(np.int32) + 128) >> 8, -128, 127).astype(np.int8).tobytes()
+    return nds_adpcm.encode(frames.tolist())
+
+def encode_wav(wav_path, swav_path, wave_type):
+    """Encodes one WAV into an SWAV. Returns a one-line description."""
+    frames, sample_rate, loop = read_wav(wav_path)
+    if not len(frames):
+        raise ValueError("No audio data")
+    if not 0 < sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"Sample rate {sample_rate} Hz does not fit an SWAV (max {MAX_SAMPLE_RATE})")
+
+    per_word = SAMPLES_PER_WORD[wave_type]
+    frames, loop_start = align_frames(frames, loop, per_word)
+    data = encode_frames(frames, wave_type)
+
+    # The ADPCM header occupies the first word, so the loop offset shifts by one
+    header_words = nds_adpcm.HEADER_SIZE // 4 if wave_type == WaveType.ADPCM else 0
+    loop_offset = header_words + loop_start // per_word if loop_start is not None else 0
+    if loop_offset > MAX_LOOP_OFFSET:
+        hint = "; use ADPCM" if wave_type != WaveType.ADPCM else ""
+        raise ValueError(f"Loop start {loop_start} is too far for {wave_type.name} "
+                         f"(max {(MAX_LOOP_OFFSET - header_words) * per_word} samples){hint}")
+    swav = ndspy.soundWave.SWAV.fromData(
+        data,
+        waveType=wave_type,
+        isLooped=loop_start is not None,
+        sampleRate=sample_rate,
+        time=TIMER_CLOCK // sample_rate,
+        loopOffset=loop_offset,
+        totalLength=len(data) // 4,
+    )
+    swav.saveToFile(swav_path)
+
+    loop_text = f"loop {loop[0]}-{loop[1]}" if loop else "no loop"
+    return f"{wave_type.name}, {sample_rate} Hz, {len(frames)} samples, {loop_text}"
+
+def convert_one(task):
+    """Pool worker. Returns (wav_path, ok, message)."""
+    wav_path, swav_path, wave_type = task
+    try:
+        return wav_path, True, encode_wav(wav_path, swav_path, wave_type)
+    except ValueError as e:
+        return wav_path, False, str(e)
+    except Exception:
+        return wav_path, False, traceback.format_exc()
+
+# ==========================================
+# COMMAND LINE / BATCH MODE
+# ==========================================
+def collect_wav_paths(inputs):
+    """Expands directories (their *.wav files) and glob patterns, keeping order and dropping duplicates."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(e.path for e in os.scandir(item)
+                                if e.is_file() and e.name.lower().endswith(".wav")))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def swav_path_for(wav_path, output_dir):
+    name = os.path.splitext(os.path.basename(wav_path))[0] + ".swav"
+    return os.path.join(output_dir or os.path.dirname(wav_path), name)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode .wav files to NDS .swav.")
+    parser.add_argument("inputs", nargs="*", help="WAV files, folders or glob patterns (default: this script's folder)")
+    parser.add_argument("-f", "--format", choices=sorted(WAVE_TYPES), default=DEFAULT_FORMAT,
+                        help=f"SWAV encoding (default: {DEFAULT_FORMAT})")
+    parser.add_argument("-o", "--output-dir", help="write .swav files here instead of next to each .wav")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--batch", action="store_true", help="don't wait for Enter at the end")
+    args = parser.parse_args(argv)
+    # Keep a double-clicked console window open; never block scripted runs
+    pause = not args.batch and sys.stdin.isatty()
+
+    wav_paths = collect_wav_paths(args.inputs or [os.path.dirname(os.path.abspath(__file__))])
+    if not wav_paths:
+        print("[!] No .wav files found.")
+        if pause: input("Press Enter to exit...")
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    wave_type = WAVE_TYPES[args.format]
+    tasks = [(p, swav_path_for(p, args.output_dir), wave_type) for p in wav_paths]
+    jobs = max(1, min(args.jobs, len(tasks)))
+    print(f"--- WAV to SWAV Encoder ({wave_type.name}) ---")
+    print(f"Encoding {len(tasks)} files with {jobs} worker(s)...")
+    print("-" * 45)
+
+    failed = 0
+    with contextlib.ExitStack() as stack:
+        if jobs == 1:
+            results = map(convert_one, tasks)
+        else:
+            pool = stack.enter_context(concurrent.futures.ProcessPoolExecutor(max_workers=jobs))
+            # Many short files: hand them out in chunks to keep IPC overhead low
+            results = pool.map(convert_one, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+
+        for (wav_path, swav_path, _), (_, ok, message) in zip(tasks, results):
+            if ok:
+                print(f"  [OK] {os.path.basename(wav_path)} -> {os.path.basename(swav_path)} ({message})")
+            else:
+                failed += 1
+                print(f"  [FAILED] {os.path.basename(wav_path)}: {message}")
+
+    print("-" * 45)
+    print(f"{len(tasks) - failed} encoded, {failed} failed")
+    if pause: input("Done. Press Enter to exit...")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
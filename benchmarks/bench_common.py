@@ -0,0 +1,19 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+# Helper modules (wav_io, sf2_reader, ...) import directly from the repo
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+def load_converter():
+    # CSV-2-SBNK.py is a drag-and-drop script, so it is loaded by path
+    spec = importlib.util.spec_from_file_location("csv_2_sbnk", REPO_DIR / "CSV-2-SBNK.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+pdta Build Benchmark
+Generates a synthetic large bank (default: 128 presets, 7k regions) in
+SF2Generator and reports how long the pdta chunk takes to build.
+7281 regions is the most an SF2 can index (9 generators each, 16-bit ibag).
+"""
+
+import argparse
+import sys
+import time
+
+from bench_common import load_converter
+
+def build_synthetic_bank(converter, n_presets, n_regions, n_samples):
+    sf2 = converter.SF2Generator("PdtaBench")
+    for s in range(n_samples):
+        sf2.samples.append({
+            'name': f"{s:02d}_Synth", 'length': 22050, 'sample_rate': 22050,
+            'original_pitch': 60, 'pitch_correction': 0,
+            'loop_start': 100, 'loop_end': 22049, 'found_loop': True
+        })
+
+    per_preset, extra = divmod(n_regions, n_presets)
+    region_idx = 0
+    for p in range(n_presets):
+        regions = []
+        for k in range(per_preset + (1 if p < extra else 0)):
+            key = k % 128
+            regions.append({
+                'sample_idx': region_idx % n_samples,
+                'key_min': key, 'key_max': key, 'root_key': key,
+                'attack_tc': -12000, 'decay_tc': 315, 'sustain': 120,
+                'release_tc': -386, 'pan': 64, 'loop_mode': region_idx % 2
+            })
+            region_idx += 1
+        idx = sf2.create_instrument(f"Inst{p:03d}", regions)
+        sf2.create_preset(f"Inst{p:03d}", 0, p, idx)
+    return sf2
+
+def main():
+    parser = argparse.ArgumentParser(description="Time SF2Generator.build_pdta on a synthetic bank.")
+    parser.add_argument("--presets", type=int, default=128)
+    parser.add_argument("--regions", type=int, default=7000)
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    converter = load_converter()
+    sf2 = build_synthetic_bank(converter, args.presets, args.regions, args.samples)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        pdta = sf2.build_pdta()
+        timings.append(time.perf_counter() - start)
+
+    print(f"--- pdta Build Benchmark ---")
+    print(f"Presets: {args.presets}  Regions: {args.regions}  Samples: {args.samples}")
+    print(f"pdta size: {len(pdta)} bytes")
+    print(f"Best: {min(timings) * 1000:.2f} ms  Mean: {sum(timings) / len(timings) * 1000:.2f} ms  (x{args.repeat})")
+
+if __name__ == "__main__":
+    sys.exit(main())
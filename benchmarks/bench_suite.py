@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Converter Benchmark Suite
+Synthesizes banks in several size tiers and times each converter stage
+separately: CSV parse, sample index, sample load, SBNK build+save,
+pdta build, SF2 write and SF2 validation (sf2_reader; a structural
+problem fails the run). Peak Python memory per stage is measured in a
+separate tracemalloc pass so it does not skew the timings.
+Results go to a JSON file; pass --compare to diff against an earlier run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_common import REPO_DIR, load_converter
+from synth_bank import generate_bank
+import sf2_reader
+
+# name: (instruments, waves, regional splits, range keys, frames per wave)
+TIERS = {
+    'small': (8, 16, 4, 8, 4410),
+    'medium': (64, 128, 8, 24, 11025),
+    'large': (128, 512, 8, 64, 22050),
+}
+
+STAGES = ('csv_parse', 'sample_index', 'sample_load', 'sbnk_save', 'sf2_pdta', 'sf2_write', 'sf2_validate')
+
+def run_stages(conv, csv_path, out_dir, on_stage):
+    """Runs every stage once, calling on_stage(name, fn) to execute and measure each."""
+    samples_dir = os.path.join(os.path.dirname(csv_path), "Samples")
+    state = {}
+
+    def add_samples():
+        state['sf2'] = conv.SF2Generator("Bench")
+        state['sample_map'] = conv.load_sf2_samples(state['sf2'], state['bank'], state['index'])
+
+    def build_pdta():
+        conv.add_sf2_instruments(state['sf2'], state['bank'], state['sample_map'])
+        state['pdta'] = state['sf2'].build_pdta()
+
+    def validate_sf2():
+        problems = sf2_reader.validate(os.path.join(out_dir, "bench.sf2"))
+        if problems:
+            raise AssertionError("Generated SF2 is invalid:\n  " + "\n  ".join(problems))
+
+    on_stage('csv_parse', lambda: state.__setitem__('bank', conv.read_bank_csv(csv_path)))
+    on_stage('sample_index', lambda: state.__setitem__('index', conv.build_sample_index(samples_dir)))
+    on_stage('sample_load', add_samples)
+    on_stage('sbnk_save', lambda: conv.build_sbnk(state['bank'], os.path.join(out_dir, "bench.sbnk")))
+    on_stage('sf2_pdta', build_pdta)
+    on_stage('sf2_write', lambda: state['sf2'].write_sf2(os.path.join(out_dir, "bench.sf2")))
+    on_stage('sf2_validate', validate_sf2)
+    return state
+
+def bench_tier(conv, name, params, repeat, work_dir):
+    tier_dir = os.path.join(work_dir, name)
+    csv_path, counts = generate_bank(tier_dir, *params)
+    timings = {stage: [] for stage in STAGES}
+
+    def timed(stage, fn):
+        start = time.perf_counter()
+        fn()
+        timings[stage].append(time.perf_counter() - start)
+
+    peaks = {}
+    def traced(stage, fn):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - base
+
+    # The converter prints per instrument/sample; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            state = run_stages(conv, csv_path, tier_dir, timed)
+        tracemalloc.start()
+        run_stages(conv, csv_path, tier_dir, traced)
+        tracemalloc.stop()
+
+    counts.update({
+        'regions': sum(len(inst['regions']) for inst in state['sf2'].instruments),
+        'samples': len(state['sf2'].samples),
+        'sample_bytes': sum(s['length'] * 2 for s in state['sf2'].samples),
+        'pdta_bytes': len(state['pdta']),
+        'sf2_bytes': os.path.getsize(os.path.join(tier_dir, "bench.sf2")),
+        'sbnk_bytes': os.path.getsize(os.path.join(tier_dir, "bench.sbnk")),
+    })
+    stages = {stage: {'seconds': min(timings[stage]), 'peak_bytes': peaks[stage]} for stage in STAGES}
+    return {'counts': counts, 'stages': stages}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, baseline=None):
+    for tier, data in results['tiers'].items():
+        c = data['counts']
+        print(f"\n[{tier}] {c['instruments']} instruments, {c['regions']} regions, "
+              f"{c['samples']} samples ({c['sample_bytes'] / 1e6:.1f} MB PCM)")
+        print(f"  {'STAGE':<14} {'TIME (ms)':>10} {'PEAK (KB)':>10}" + (f" {'VS BASE':>9}" if baseline else ""))
+        for stage, m in data['stages'].items():
+            line = f"  {stage:<14} {m['seconds'] * 1000:>10.2f} {m['peak_bytes'] / 1024:>10.1f}"
+            old = baseline and baseline['tiers'].get(tier, {}).get('stages', {}).get(stage)
+            if old and old['seconds'] > 0:
+                line += f" {m['seconds'] / old['seconds']:>8.2f}x"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV -> SBNK/SF2 converter stage by stage.")
+    parser.add_argument("--tiers", nargs="+", choices=sorted(TIERS), default=list(TIERS))
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per tier (best is kept)")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="JSON", help="earlier results to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the generated banks")
+    args = parser.parse_args()
+
+    conv = load_converter()
+    work_dir = tempfile.mkdtemp(prefix="nds_bench_")
+    try:
+        results = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'tiers': {name: bench_tier(conv, name, TIERS[name], args.repeat, work_dir) for name in args.tiers},
+        }
+    finally:
+        if args.keep:
+            print(f"Generated banks kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.compare} (revision {baseline.get('revision')})")
+    print_results(results, baseline)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Synthetic Bank Generator
+Writes a CSV with a mix of Simple/Regional/Range instruments plus matching
+Samples/NN_name.wav files (16-bit mono, with 'smpl' loops on every other
+wave), laid out exactly like a real project folder.
+"""
+
+import argparse
+import array
+import math
+import os
+import random
+import struct
+import sys
+
+CSV_HEADER = "InstID,Type,NoteType,WaveID,RootKey,KeyMin,KeyMax,Attack,Decay,Sustain,Release,Pan,LOOP,Comment"
+
+def write_wav(path, n_frames, wave_id, sample_rate=22050, loop=None):
+    # A short per-wave period tiled to length keeps generation fast and every wave unique
+    period_len = 64 + wave_id % 193
+    period = array.array('h', (int(12000 * math.sin(2 * math.pi * i / period_len) + (wave_id * 37) % 512)
+                               for i in range(period_len)))
+    pcm = period * (n_frames // period_len + 1)
+    del pcm[n_frames:]
+    if sys.byteorder == 'big':
+        pcm.byteswap()
+    data = pcm.tobytes()
+
+    chunks = b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    chunks += b'data' + struct.pack('<I', len(data)) + data
+    if loop:
+        smpl = struct.pack('<9I', 0, 0, 0, 60, 0, 0, 0, 1, 0) + struct.pack('<6I', 0, 0, loop[0], loop[1], 0, 0)
+        chunks += b'smpl' + struct.pack('<I', len(smpl)) + smpl
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks)
+
+def generate_bank(out_dir, n_instruments=128, n_waves=256, regional_splits=8, range_keys=40,
+                  sample_frames=11025, seed=1234):
+    """
+    Creates out_dir/bank.csv and out_dir/Samples. Instruments cycle through
+    simple, regional (regional_splits rows) and range (range_keys single-key rows).
+    Returns (csv_path, counts).
+    """
+    rng = random.Random(seed)
+    samples_dir = os.path.join(out_dir, "Samples")
+    os.makedirs(samples_dir, exist_ok=True)
+
+    for wave_id in range(n_waves):
+        frames = sample_frames + rng.randrange(sample_frames // 4 + 1)
+        loop = (frames // 4, frames - 1) if wave_id % 2 else None
+        write_wav(os.path.join(samples_dir, f"{wave_id:02d}_Synth{wave_id}.wav"), frames, wave_id, loop=loop)
+
+    def adsr():
+        return f"{rng.randrange(100, 128)},{rng.randrange(60, 128)},{rng.randrange(0, 128)},{rng.randrange(60, 128)},{rng.randrange(0, 128)}"
+
+    lines = [CSV_HEADER]
+    counts = {'instruments': n_instruments, 'rows': 0, 'waves': n_waves}
+    for inst_id in range(n_instruments):
+        kind = inst_id % 3
+        if kind == 0:
+            lines.append(f"{inst_id},Simple,PCM,{rng.randrange(n_waves)},60,,,{adsr()},,Simple{inst_id}")
+        elif kind == 1:
+            for split in range(regional_splits):
+                key_max = min(127, (split + 1) * (128 // regional_splits) - 1)
+                lines.append(f"{inst_id},Regional,PCM,{rng.randrange(n_waves)},{max(0, key_max - 6)},,{key_max},{adsr()},,Regional{inst_id}")
+        else:
+            for k in range(range_keys):
+                key = 24 + k % 104
+                loop = "no" if k % 3 else ""
+                lines.append(f"{inst_id},Range,PCM,{rng.randrange(n_waves)},{key},{key},{key},{adsr()},{loop},Kit{inst_id}")
+    counts['rows'] = len(lines) - 1
+
+    csv_path = os.path.join(out_dir, "bank.csv")
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        f.write("\n".join(lines) + "\n")
+    return csv_path, counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic CSV bank with matching Samples.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--instruments", type=int, default=128)
+    parser.add_argument("--waves", type=int, default=256)
+    parser.add_argument("--splits", type=int, default=8, help="rows per Regional instrument (SBNK allows at most 8)")
+    parser.add_argument("--range-keys", type=int, default=40, help="rows per Range instrument")
+    parser.add_argument("--frames", type=int, default=11025, help="minimum frames per wave")
+    args = parser.parse_args()
+
+    csv_path, counts = generate_bank(args.out_dir, args.instruments, args.waves, args.splits,
+                                     args.range_keys, args.frames)
+    print(f"Wrote {csv_path}: {counts['instruments']} instruments, {counts['rows']} rows, {counts['waves']} waves")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+MIDI Usage Index
+Reads Standard MIDI Files the way SMFconv converts them (see
+SMFconvMIDIinfo.md) and records every (program, key) pair a song can play,
+so CSV-2-SBNK can leave out instruments, regions and range keys no song uses.
+
+Program Change and 'prg' text commands select the instrument, CC 13 and
+'transpose' shift the key used for the lookup. Commands whose outcome is only
+known at run time stay conservative: '_r' counts every value in its range,
+'_v' every possible value, and '_if' keeps the previous state as possible too.
+
+Events are read once, in time order. Flow control is not followed but
+over-approximated, so the index never misses a pair a song can play:
+a channel that loops (CC 89/90, 'loop_start'/'loop_end', '['/']') plays each
+of its notes with every program and transpose it ever selects, and a channel
+that jumps or calls may play any note of the file with its own states, since
+the label can be on any track.
+"""
+
+import argparse
+import glob
+import os
+import re
+import struct
+import sys
+
+N_CHANNELS = 16
+ALL_PROGRAMS = frozenset(range(128))
+# 'transpose' range; CC 13 is centered on 64
+ALL_TRANSPOSES = frozenset(range(-64, 64))
+CC_TRANSPOSE = 13
+CC_LOOP_START = 89
+CC_LOOP_END = 90
+LOOP_COMMANDS = frozenset(('loop_start', 'loop_end'))
+JUMP_COMMANDS = frozenset(('jump', 'call'))
+# Global loop markers, entered as plain text events
+LOOP_MARKERS = frozenset(('[', ']'))
+
+# 'text_all: prg 14', 'text_03: transpose_r -2, 2'
+TEXT_COMMAND = re.compile(r'^\s*text_(all|\d+)\s*:\s*([a-z_]+)\s*(.*)$', re.IGNORECASE)
+
+# ==========================================
+# SMF READER
+# ==========================================
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+def read_events(path):
+    """
+    All channel and text events of an SMF, merged across tracks in time order:
+    [(tick, status, data1, data2)] for channel messages and
+    [(tick, 'text', text, None)] for text meta events.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != b'MThd':
+        raise ValueError("Not a Standard MIDI File")
+    header_len = struct.unpack_from('>I', data, 4)[0]
+    pos = 8 + header_len
+
+    events = []
+    track = 0
+    while pos + 8 <= len(data):
+        chunk_id, chunk_len = struct.unpack_from('>4sI', data, pos)
+        start, end = pos + 8, min(pos + 8 + chunk_len, len(data))
+        pos = start + chunk_len
+        if chunk_id != b'MTrk': continue
+
+        tick = 0
+        status = 0
+        p = start
+        while p < end:
+            delta, p = _read_varlen(data, p)
+            tick += delta
+            if data[p] & 0x80:
+                status = data[p]
+                p += 1
+            if status == 0xFF:
+                meta_type = data[p]
+                length, p = _read_varlen(data, p + 1)
+                if meta_type == 0x01:
+                    events.append((tick, track, 'text', data[p:p + length].decode('latin-1'), None))
+                p += length
+                status = 0  # Meta and sysex events cancel running status
+            elif status in (0xF0, 0xF7):
+                length, p = _read_varlen(data, p)
+                p += length
+                status = 0
+            elif status >= 0x80:
+                kind = status & 0xF0
+                if kind in (0xC0, 0xD0):
+                    events.append((tick, track, status, data[p], None))
+                    p += 1
+                else:
+                    events.append((tick, track, status, data[p], data[p + 1]))
+                    p += 2
+            else:
+                raise ValueError(f"Running status without a status byte at offset {p}")
+        track += 1
+
+    # Stable on (tick, track), so same-tick events keep their file order
+    events.sort(key=lambda e: (e[0], e[1]))
+    return [(tick, kind, a, b) for tick, _, kind, a, b in events]
+
+# ==========================================
+# USAGE INDEX
+# ==========================================
+def _command_values(suffixes, args, full_range):
+    """Possible values of a 'prg'/'transpose' text command, or None if it can't be parsed."""
+    if 'v' in suffixes:
+        return set(full_range)
+    numbers = [int(n) for n in re.findall(r'-?\d+', args)]
+    if 'r' in suffixes:
+        if len(numbers) < 2: return None
+        return set(range(numbers[0], numbers[1] + 1)) & full_range
+    return {numbers[0]} & full_range if numbers else None
+
+class MidiUsage:
+    """{program: set of keys} played by a set of songs."""
+
+    def __init__(self):
+        self.keys = {}
+        self.files = 0
+
+    def add_file(self, path):
+        """Adds every (program, key) one SMF can play."""
+        programs = [{0} for _ in range(N_CHANNELS)]
+        transposes = [{0} for _ in range(N_CHANNELS)]
+        # Every state each channel ever takes, its notes, and its flow control
+        all_programs = [{0} for _ in range(N_CHANNELS)]
+        all_transposes = [{0} for _ in range(N_CHANNELS)]
+        notes = [set() for _ in range(N_CHANNELS)]
+        loops = set()
+        jumps = set()
+
+        def apply(channels, command, values, conditional):
+            states, seen = (programs, all_programs) if command == 'prg' else (transposes, all_transposes)
+            for ch in channels:
+                states[ch] = (states[ch] | values) if conditional else set(values)
+                seen[ch] |= values
+
+        for _, kind, a, b in read_events(path):
+            if kind == 'text':
+                if a.strip() in LOOP_MARKERS:
+                    loops.update(range(N_CHANNELS))
+                    continue
+                match = TEXT_COMMAND.match(a)
+                if not match: continue
+                target, name, args = match.groups()
+                channels = range(N_CHANNELS) if target.lower() == 'all' else [int(target) % N_CHANNELS]
+                name = name.lower()
+                # 'jump_if', 'loop_start_r', ...
+                if any(name == c or name.startswith(c + '_') for c in LOOP_COMMANDS):
+                    loops.update(channels)
+                    continue
+                command, *suffixes = name.split('_')
+                if command in JUMP_COMMANDS:
+                    jumps.update(channels)
+                    continue
+                if command not in ('prg', 'transpose'): continue
+                values = _command_values(set(suffixes), args,
+                                         ALL_PROGRAMS if command == 'prg' else ALL_TRANSPOSES)
+                if values is None: continue
+                apply(channels, command, values, 'if' in suffixes)
+                continue
+
+            kind, ch = kind & 0xF0, kind & 0x0F
+            if kind == 0xC0:
+                apply([ch], 'prg', {a}, False)
+            elif kind == 0xB0 and a == CC_TRANSPOSE:
+                apply([ch], 'transpose', {b - 64}, False)
+            elif kind == 0xB0 and a in (CC_LOOP_START, CC_LOOP_END):
+                loops.add(ch)
+            elif kind == 0x90 and b > 0:
+                notes[ch].add(a)
+                self._add(programs[ch], a, transposes[ch])
+
+        for ch in loops:
+            for key in notes[ch]:
+                self._add(all_programs[ch], key, all_transposes[ch])
+        every_note = set().union(*notes)
+        for ch in jumps:
+            for key in every_note:
+                self._add(all_programs[ch], key, all_transposes[ch])
+        self.files += 1
+
+    def _add(self, programs, key, transposes):
+        keys = {min(127, max(0, key + t)) for t in transposes}
+        for program in programs:
+            self.keys.setdefault(program, set()).update(keys)
+
+    def used_keys(self, program):
+        return self.keys.get(program, set())
+
+    def summary_lines(self):
+        lines = [f"{self.files} MIDI file(s), {len(self.keys)} program(s) used"]
+        for program in sorted(self.keys):
+            keys = sorted(self.keys[program])
+            lines.append(f"  prg {program:>3}: {len(keys):>3} key(s), {keys[0]}-{keys[-1]}")
+        return lines
+
+def collect_midi_paths(inputs):
+    """Expands directories (their *.mid/*.midi files) and glob patterns, dropping duplicates."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(e.path for e in os.scandir(item)
+                                if e.is_file() and e.name.lower().endswith((".mid", ".midi"))))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def load_usage(inputs):
+    """MidiUsage over every MIDI file in inputs (files, folders or patterns)."""
+    usage = MidiUsage()
+    for path in collect_midi_paths(inputs):
+        try:
+            usage.add_file(path)
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"{os.path.basename(path)}: {e or 'truncated file'}") from None
+    return usage
+
+def main():
+    parser = argparse.ArgumentParser(description="List the programs and keys a set of MIDI files plays.")
+    parser.add_argument("inputs", nargs="+", help="MIDI files, folders or glob patterns")
+    args = parser.parse_args()
+    try:
+        usage = load_usage(args.inputs)
+    except (OSError, ValueError) as e:
+        print(f"[!] {e}")
+        return 1
+    print("\n".join(usage.summary_lines()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+NDS Sound RAM Budget
+Estimates the bytes each wave takes once WAV-2-SWAV encodes it and
+SWAV-2-SWAR packs it, picks lower sample rates so a bank fits a byte
+budget, and resamples with a band-limited (windowed-sinc) filter.
+NumPy is only imported by resample().
+"""
+
+import math
+
+FORMATS = ('adpcm', 'pcm8', 'pcm16')
+# Samples per 32-bit word, as aligned by WAV-2-SWAV
+SAMPLES_PER_WORD = {'pcm8': 4, 'pcm16': 2, 'adpcm': 8}
+ADPCM_HEADER_SIZE = 4
+# SWAR: file header + DATA block header + wave count, then per wave an offset and a 12-byte info block
+SWAR_HEADER_SIZE = 0x3C
+SWAR_WAVE_OVERHEAD = 4 + 12
+
+DEFAULT_MIN_RATE = 8000
+# Kernel half width in zero crossings of the low-pass sinc
+SINC_ZERO_CROSSINGS = 16
+# Cutoff as a fraction of the output Nyquist, leaving room for the transition band
+CUTOFF_MARGIN = 0.95
+RESAMPLE_CHUNK = 4096
+
+# ==========================================
+# SIZE ESTIMATES
+# ==========================================
+def aligned_frames(n_frames, loop, fmt):
+    """Frame count after WAV-2-SWAV's word alignment (see align_frames there)."""
+    per_word = SAMPLES_PER_WORD[fmt]
+    if loop is None:
+        return n_frames + (-n_frames) % per_word
+    loop_start, loop_end = loop
+    pad_front = (-loop_start) % per_word
+    loop_len = loop_end - loop_start + 1
+    return pad_front + loop_end + 1 + (-loop_len) % per_word
+
+def data_bytes(n_frames, fmt):
+    if fmt == 'adpcm':
+        return ADPCM_HEADER_SIZE + n_frames // 2
+    return n_frames * (2 if fmt == 'pcm16' else 1)
+
+def wave_bytes(n_frames, loop, fmt):
+    """Bytes one wave adds to a SWAR."""
+    return SWAR_WAVE_OVERHEAD + data_bytes(aligned_frames(n_frames, loop, fmt), fmt)
+
+def archive_bytes(wave_sizes):
+    return SWAR_HEADER_SIZE + sum(wave_sizes)
+
+# ==========================================
+# RATE PLANNING
+# ==========================================
+def scale_wave(n_frames, loop, ratio):
+    """
+    Frame count and loop (start, inclusive end) after resampling by ratio.
+    A looped wave snaps the ratio so the loop length stays a whole number of
+    frames, which keeps the loop seamless. Returns (n_frames, loop, exact_ratio).
+    """
+    if loop is not None:
+        loop_start, loop_end = loop
+        loop_len = loop_end - loop_start + 1
+        new_len = max(1, round(loop_len * ratio))
+        ratio = new_len / loop_len
+        new_start = round(loop_start * ratio)
+        loop = (new_start, new_start + new_len - 1)
+        return max(loop[1] + 1, round(n_frames * ratio)), loop, ratio
+    return max(1, round(n_frames * ratio)), None, ratio
+
+def planned_bytes(wave, rate, fmt):
+    if rate >= wave['rate']:
+        return wave_bytes(wave['frames'], wave['loop'], fmt)
+    n_frames, loop, _ = scale_wave(wave['frames'], wave['loop'], rate / wave['rate'])
+    return wave_bytes(n_frames, loop, fmt)
+
+def plan_rates(waves, budget, fmt, candidates=None, min_rate=DEFAULT_MIN_RATE):
+    """
+    Chooses new sample rates so the archive fits budget bytes.
+    waves: {wave_id: {'frames', 'rate', 'loop'}}; candidates: the WaveIDs that may
+    be resampled (default all). Every candidate is scaled by the same factor,
+    never below min_rate, so relative quality is preserved. Returns
+    ({wave_id: new_rate} for waves that change, estimated archive bytes).
+    """
+    candidates = set(waves) if candidates is None else set(candidates) & set(waves)
+
+    def plan(factor):
+        rates = {}
+        for wave_id in candidates:
+            rate = waves[wave_id]['rate']
+            new_rate = max(min(min_rate, rate), int(rate * factor))
+            if new_rate < rate:
+                rates[wave_id] = new_rate
+        total = archive_bytes(planned_bytes(wave, rates.get(wave_id, wave['rate']), fmt)
+                              for wave_id, wave in waves.items())
+        return rates, total
+
+    rates, total = plan(1.0)
+    if total <= budget:
+        return {}, total
+    # Size falls monotonically with the factor: binary search for the largest one that fits
+    lo, hi = 0.0, 1.0
+    best = plan(0.0)
+    for _ in range(32):
+        mid = (lo + hi) / 2
+        rates, total = plan(mid)
+        if total <= budget:
+            best = (rates, total)
+            lo = mid
+        else:
+            hi = mid
+    return best
+
+# ==========================================
+# RESAMPLING
+# ==========================================
+def resample(frames, new_rate, rate, loop=None):
+    """
+    Band-limited resampling of int16 mono frames from rate to new_rate.
+    The loop (start, end) is mapped exactly (see scale_wave), and the kernel
+    reads past the loop end as the loop wrapping around. Returns
+    (int16 frames, new loop or None, exact output rate).
+    """
+    import numpy as np
+
+    x = np.asarray(frames, dtype=np.float64)
+    n_out, new_loop, ratio = scale_wave(len(x), loop, new_rate / rate)
+    cutoff = min(1.0, ratio) * CUTOFF_MARGIN
+
+    if new_loop is None:
+        out = _sinc_interpolate(x, np.arange(n_out) / ratio, cutoff)
+    else:
+        loop_start, loop_end = loop
+        positions = loop_start + (np.arange(n_out) - new_loop[0]) / ratio
+        # Up to the loop end, the samples after it are the loop start again
+        reach = int(math.ceil(SINC_ZERO_CROSSINGS / cutoff)) + 2
+        wrapped = np.concatenate([x[:loop_end + 1], np.resize(x[loop_start:loop_end + 1], reach)])
+        head = _sinc_interpolate(wrapped, positions[:new_loop[1] + 1], cutoff)
+        tail = _sinc_interpolate(x, positions[new_loop[1] + 1:], cutoff)
+        out = np.concatenate([head, tail])
+
+    out = np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+    return out, new_loop, rate * ratio
+
+def _sinc_interpolate(x, positions, cutoff):
+    """Evaluates x at fractional positions through a Hann-windowed sinc low-pass at cutoff."""
+    import numpy as np
+
+    half_width = SINC_ZERO_CROSSINGS / cutoff
+    taps = 2 * int(math.ceil(half_width))
+    tap_offsets = np.arange(taps) - taps // 2 + 1
+    out = np.empty(len(positions))
+    for start in range(0, len(positions), RESAMPLE_CHUNK):
+        t = positions[start:start + RESAMPLE_CHUNK]
+        idx = np.floor(t).astype(np.int64)[:, None] + tap_offsets
+        dist = t[:, None] - idx
+        window = np.where(np.abs(dist) < half_width, 0.5 + 0.5 * np.cos(np.pi * dist / half_width), 0.0)
+        kernel = cutoff * np.sinc(cutoff * dist) * window
+        inside = (idx >= 0) & (idx < len(x))
+        out[start:start + RESAMPLE_CHUNK] = (kernel * np.where(inside, x[np.clip(idx, 0, len(x) - 1)], 0.0)).sum(axis=1)
+    return out
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+NDS Envelope Tables
+Hardware ADSR tables and their SF2 conversions. (rate, sustain) results are
+precomputed once per rate on first use, so converters do O(1) lookups instead
+of per-region log math. The same data can be exported as JSON or synced into
+NDS-Envelope-Editor.html so the editor and the converter never drift apart.
+"""
+
+import argparse
+import json
+import math
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+# ==========================================
+# TUNING CONSTANTS
+# ==========================================
+# Release: NDS (Linear) -> SF2 (Exponential) requires stretching (~3.1x)
+# Decay: Kept 1:1 to preserve punchiness of attack transients
+SF2_RELEASE_SCALAR = 1.8
+
+# ==========================================
+# TABLES & CONVERSIONS
+# ==========================================
+
+ATTACK_TABLE = [
+    8606.1, 4756.3, 3339.3, 2594.4, 2130.7, 1807.7, 1573.3, 1401.4,
+    1255.5, 1140.9, 1047.1, 963.8, 896.0, 838.7, 786.6, 745.0,
+    703.3, 666.8, 630.4, 599.1, 578.3, 547.0, 526.2, 505.3,
+    484.5, 468.9, 448.0, 437.6, 416.8, 406.4, 395.9, 385.5,
+    369.9, 359.5, 349.0, 338.6, 328.2, 323.0, 312.6, 307.4,
+    297.0, 291.7, 286.5, 276.1, 270.9, 265.7, 260.5, 255.3,
+    250.1, 244.9, 239.6, 234.4, 229.2, 224.0, 218.8, 213.6,
+    213.6, 208.4, 203.2, 203.2, 198.0, 198.0, 192.8, 192.8,
+    182.3, 182.3, 177.1, 177.1, 171.9, 171.9, 166.7, 166.7,
+    161.5, 161.5, 156.3, 156.3, 151.1, 151.1, 145.9, 145.9,
+    145.9, 145.9, 140.7, 140.7, 140.7, 130.2, 130.2, 130.2,
+    125.0, 125.0, 125.0, 125.0, 119.8, 119.8, 119.8, 114.6,
+    114.6, 114.6, 114.6, 109.4, 109.4, 109.4, 109.4, 109.4,
+    104.2, 104.2, 104.2, 104.2, 99.0, 93.8, 88.6, 83.4,
+    78.2, 72.9, 67.7, 62.5, 57.3, 52.1, 46.9, 41.7,
+    36.5, 31.3, 26.1, 20.8, 15.6, 10.4, 10.4, 0.0
+]
+
+MAX_DR_TABLE = [
+    481228.8, 160409.6, 96241.6, 68744.0, 53466.4, 43747.6, 37013.6, 32078.8,
+    28303.6, 25324.0, 22911.2, 20919.6, 19245.2, 17820.4, 16593.2, 15522.0,
+    14580.8, 13748.8, 13005.2, 12334.4, 11736.4, 11190.4, 10691.2, 10238.8,
+    9817.6, 9432.8, 9079.2, 8746.4, 8439.6, 8153.6, 7888.4, 7633.6,
+    7399.6, 7181.2, 6973.2, 6775.6, 6588.4, 6411.6, 6245.2, 6089.2,
+    5938.4, 5792.8, 5657.6, 5527.6, 5402.8, 5283.2, 5174.0, 5064.8,
+    4960.8, 4856.8, 4758.0, 4695.6, 4633.2, 4570.8, 4508.4, 4446.0,
+    4383.6, 4321.2, 4258.8, 4196.4, 4134.0, 4071.6, 4009.2, 3946.8,
+    3884.4, 3822.0, 3759.6, 3692.0, 3629.6, 3567.2, 3504.8, 3442.4,
+    3380.0, 3317.6, 3255.2, 3192.8, 3130.4, 3068.0, 3005.6, 2943.2,
+    2880.8, 2818.4, 2756.0, 2693.6, 2631.2, 2568.8, 2506.4, 2438.8,
+    2376.4, 2314.0, 2251.6, 2189.2, 2126.8, 2064.4, 2002.0, 1939.6,
+    1877.2, 1814.8, 1752.4, 1690.0, 1627.6, 1565.2, 1502.8, 1440.4,
+    1378.0, 1315.6, 1253.2, 1185.6, 1123.2, 1060.8, 998.4, 936.0,
+    873.6, 811.2, 748.8, 686.4, 624.0, 561.6, 499.2, 436.8,
+    374.4, 312.0, 249.6, 187.2, 124.8, 62.4, 31.2, 5.2
+]
+
+def get_sustain_linear(val):
+    return (val / 127.0) ** 2
+
+def get_attack_ms(val):
+    return 0.0 if val >= 127 else ATTACK_TABLE[val]
+
+def get_decay_time_hw(decay_val, sustain_val):
+    if decay_val >= 127: return 0.0
+    max_time = MAX_DR_TABLE[decay_val]
+    sus_frac = get_sustain_linear(sustain_val)
+    return max_time * (1.0 - sus_frac)
+
+def get_release_time_hw(release_val, sustain_val):
+    if release_val >= 127: return 0.0
+    max_time = MAX_DR_TABLE[release_val]
+    sus_frac = get_sustain_linear(sustain_val)
+    return max_time * sus_frac
+
+def get_sustain_db_sf2(val):
+    if val >= 127: return 0
+    if val == 0: return 1440
+    fraction = (val / 127.0) ** 2
+    if fraction > 0:
+        attenuation = -20 * math.log10(fraction)
+    else:
+        attenuation = 144.0
+    return int(min(max(attenuation * 10, 0), 1440))
+
+def ms_to_timecents(ms):
+    if ms <= 0: return -12000
+    seconds = ms / 1000.0
+    timecents = int(1200 * math.log2(seconds))
+    return max(-12000, min(timecents, 8000))
+
+# ==========================================
+# PRECOMPUTED SF2 TABLES
+# ==========================================
+
+EnvelopeTables = namedtuple('EnvelopeTables', 'attack_tc decay_tc release_tc sustain_cb')
+
+# Tables are filled one rate row (128 sustain values) at a time on first use,
+# so a small bank never pays for the full 128x128 grid
+@lru_cache(maxsize=None)
+def _attack_sustain_tables():
+    return (tuple(ms_to_timecents(get_attack_ms(a)) for a in range(128)),
+            tuple(get_sustain_db_sf2(s) for s in range(128)))
+
+@lru_cache(maxsize=None)
+def _decay_row(decay):
+    return tuple(ms_to_timecents(get_decay_time_hw(decay, s)) for s in range(128))
+
+@lru_cache(maxsize=None)
+def _release_row(release, release_scalar):
+    return tuple(ms_to_timecents(get_release_time_hw(release, s) * release_scalar) for s in range(128))
+
+def get_tables(release_scalar=SF2_RELEASE_SCALAR):
+    """
+    Full SF2 tables: attack_tc[attack], decay_tc[decay][sustain],
+    release_tc[release][sustain] (timecents, release scaled by release_scalar)
+    and sustain_cb[sustain] (centibels of attenuation).
+    """
+    attack_tc, sustain_cb = _attack_sustain_tables()
+    return EnvelopeTables(
+        attack_tc=attack_tc,
+        decay_tc=tuple(_decay_row(d) for d in range(128)),
+        release_tc=tuple(_release_row(r, release_scalar) for r in range(128)),
+        sustain_cb=sustain_cb
+    )
+
+def _clamp7(val):
+    return 0 if val < 0 else 127 if val > 127 else val
+
+def sf2_envelope(attack, decay, sustain, release, release_scalar=SF2_RELEASE_SCALAR):
+    """NDS ADSR (0-127 each) -> (attack_tc, decay_tc, sustain_cb, release_tc) for SF2 generators."""
+    attack_tc, sustain_cb = _attack_sustain_tables()
+    sustain = _clamp7(sustain)
+    return (attack_tc[_clamp7(attack)], _decay_row(_clamp7(decay))[sustain],
+            sustain_cb[sustain], _release_row(_clamp7(release), release_scalar)[sustain])
+
+def sf2_envelopes(rows, release_scalar=SF2_RELEASE_SCALAR):
+    """Batch form of sf2_envelope for an iterable of (attack, decay, sustain, release) rows."""
+    return [sf2_envelope(a, d, s, r, release_scalar) for a, d, s, r in rows]
+
+# ==========================================
+# EXPORT FOR NDS-Envelope-Editor.html
+# ==========================================
+
+HTML_TABLES_START = "    // --- Data Tables ---"
+HTML_TABLES_END = "    // --- State & DOM ---"
+
+def tables_as_dict(release_scalar=SF2_RELEASE_SCALAR):
+    t = get_tables(release_scalar)
+    return {
+        'release_scalar': release_scalar,
+        'attack_ms': ATTACK_TABLE,
+        'max_dr_ms': MAX_DR_TABLE,
+        'attack_tc': list(t.attack_tc),
+        'sustain_cb': list(t.sustain_cb),
+        'decay_tc': [list(row) for row in t.decay_tc],
+        'release_tc': [list(row) for row in t.release_tc]
+    }
+
+def _js_array(name, values):
+    lines = [", ".join(f"{v:.1f}" for v in values[i:i + 8]) for i in range(0, len(values), 8)]
+    return f"    const {name} = [\n        " + ",\n        ".join(lines) + "\n    ];\n"
+
+def sync_html(html_path, release_scalar=SF2_RELEASE_SCALAR):
+    """Rewrites the editor's data-table block from this module's tables."""
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    start = html.find(HTML_TABLES_START)
+    end = html.find(HTML_TABLES_END)
+    if start < 0 or end < start:
+        raise ValueError(f"Data table markers not found in {html_path}")
+
+    block = (HTML_TABLES_START + " (generated by nds_envelope.py --sync-html, edit the Python tables instead)\n"
+             + _js_array("ATTACK_TABLE", ATTACK_TABLE) + "\n"
+             + _js_array("MAX_DR_TABLE", MAX_DR_TABLE) + "\n"
+             + f"    const SF2_RELEASE_SCALAR = {release_scalar!r}; // Only Scale Release\n\n")
+    with open(html_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(html[:start] + block + html[end:])
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the NDS envelope tables.")
+    parser.add_argument("--export-json", metavar="PATH", help="write all tables as JSON")
+    parser.add_argument("--sync-html", metavar="PATH", help="update the tables inside NDS-Envelope-Editor.html")
+    args = parser.parse_args()
+    if not args.export_json and not args.sync_html:
+        parser.print_help()
+        return 1
+
+    if args.export_json:
+        with open(args.export_json, 'w', encoding='utf-8') as f:
+            json.dump(tables_as_dict(), f, separators=(',', ':'))
+        print(f"Tables written to {args.export_json}")
+    if args.sync_html:
+        sync_html(args.sync_html)
+        print(f"Tables synced into {args.sync_html}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
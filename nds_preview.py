@@ -0,0 +1,166 @@
+"""
+NDS Instrument Preview Renderer
+Renders what a note sounds like on the DS without a ROM or an emulator:
+samples are stepped through without interpolation (the mixer plays the
+nearest lower sample) and shaped by the hardware ADSR from nds_envelope,
+using the same curve as NDS-Envelope-Editor.html. Output is 16-bit stereo
+at the mixer rate. Every note is one vectorised NumPy pass, and
+render_instrument() is a process pool worker. NumPy is required here.
+"""
+
+import math
+import os
+import re
+
+import numpy as np
+
+from nds_envelope import MAX_DR_TABLE, get_attack_ms, get_sustain_linear
+from wav_io import WavFile, sanitize_loop, to_mono16, write_wav16
+
+# DS sound mixer output rate
+PREVIEW_RATE = 32768
+# Key held this long before note-off
+HOLD_MS = 1000
+# Longest release tail rendered after note-off
+MAX_RELEASE_MS = 4000
+# PSG channels play A4 at the instrument's root key
+PSG_BASE_HZ = 440.0
+
+# ==========================================
+# ENVELOPE
+# ==========================================
+def envelope(attack, decay, sustain, release, hold_frames, rate=PREVIEW_RATE):
+    """
+    Amplitude (0..1) of a note held for hold_frames, then released.
+    Decay and release fall at 1/MAX_DR_TABLE[value] per ms, so their times match
+    get_decay_time_hw/get_release_time_hw; a note released early releases from
+    wherever the envelope is. 127 is instant for every stage. Release tails
+    longer than MAX_RELEASE_MS are cut off there, not sped up.
+    """
+    sus_level = get_sustain_linear(sustain)
+    attack_ms = get_attack_ms(attack)
+    decay_ms = 0.0 if decay >= 127 else MAX_DR_TABLE[decay] * (1.0 - sus_level)
+
+    t = np.arange(hold_frames) * (1000.0 / rate)
+    if attack_ms > 0:
+        # Smoothstep, the editor's sigmoid attack
+        x = np.minimum(t / attack_ms, 1.0)
+        held = x * x * (3.0 - 2.0 * x)
+    else:
+        held = np.ones(hold_frames)
+    if decay_ms > 0:
+        held = np.where(t < attack_ms, held, np.interp(t, [attack_ms, attack_ms + decay_ms], [1.0, sus_level]))
+    else:
+        held = np.where(t < attack_ms, held, sus_level)
+
+    level = held[-1] if hold_frames else 0.0
+    release_ms = 0.0 if release >= 127 else MAX_DR_TABLE[release] * level
+    # The ramp keeps its true slope; only the rendered tail is cut at MAX_RELEASE_MS
+    tail_frames = int(math.ceil(min(MAX_RELEASE_MS, release_ms) * rate / 1000.0))
+    tail = np.interp(np.arange(tail_frames) * (1000.0 / rate), [0.0, release_ms], [level, 0.0])
+    return np.concatenate([held, tail])
+
+# ==========================================
+# OSCILLATORS
+# ==========================================
+def play_sample(frames, sample_rate, loop, semitones, n_out, rate=PREVIEW_RATE):
+    """
+    Steps through int16 frames at sample_rate shifted by semitones, for n_out
+    output frames. loop is (start, inclusive end) or None; unlooped samples
+    are silent once they run out.
+    """
+    step = sample_rate * 2.0 ** (semitones / 12.0) / rate
+    pos = np.floor(np.arange(n_out) * step).astype(np.int64)
+    if loop is not None:
+        loop_start, loop_end = loop
+        past = pos > loop_end
+        pos[past] = loop_start + (pos[past] - loop_start) % (loop_end - loop_start + 1)
+    out = np.zeros(n_out)
+    playing = pos < len(frames)
+    out[playing] = frames[pos[playing]] / 32768.0
+    return out
+
+def play_square(duty, semitones, n_out, rate=PREVIEW_RATE):
+    """PSG square wave; duty 0-7 is a (duty + 1)/8 high time."""
+    phase = (np.arange(n_out) * (PSG_BASE_HZ * 2.0 ** (semitones / 12.0) / rate)) % 1.0
+    return np.where(phase < (min(duty, 7) + 1) / 8.0, 1.0, -1.0)
+
+def play_noise(semitones, n_out, rate=PREVIEW_RATE):
+    """PSG noise: +/-1 held for one period of the note. Seeded, so renders are reproducible."""
+    hold = rate / (PSG_BASE_HZ * 2.0 ** (semitones / 12.0))
+    n_values = int(n_out / hold) + 1
+    values = np.where(np.random.default_rng(0).random(n_values) < 0.5, -1.0, 1.0)
+    return values[(np.arange(n_out) / hold).astype(np.int64)]
+
+# ==========================================
+# RENDERING
+# ==========================================
+def render_note(voice, key, source=None, hold_ms=HOLD_MS, rate=PREVIEW_RATE):
+    """
+    Renders one key of a voice (see render_instrument) to float stereo frames.
+    source is (int16 frames, sample_rate, loop) for PCM voices.
+    """
+    hold_frames = int(hold_ms * rate / 1000)
+    env = envelope(voice['attack'], voice['decay'], voice['sustain'], voice['release'], hold_frames, rate)
+    semitones = key - voice['root_key']
+
+    if voice['type'] == 'pcm':
+        frames, sample_rate, loop = source
+        if voice['loop'] == 0:
+            loop = None
+        elif voice['loop'] == 1 and loop is None:
+            loop = (0, len(frames) - 1)
+        wave = play_sample(frames, sample_rate, loop, semitones, len(env), rate)
+    elif voice['type'] == 'psg':
+        wave = play_square(voice['duty'], semitones, len(env), rate)
+    else:
+        wave = play_noise(semitones, len(env), rate)
+
+    # Linear pan law, as the hardware mixes it
+    pan = voice['pan'] / 127.0
+    mono = wave * env
+    return np.stack([mono * (1.0 - pan), mono * pan], axis=1)
+
+def load_source(wav_path):
+    with WavFile(wav_path) as wav:
+        frames = to_mono16(wav)
+        sample_rate = wav.sample_rate
+        loop = wav.loops[0] if wav.loops else None
+    return frames, sample_rate, sanitize_loop(loop, len(frames)) if loop is not None else None
+
+def preview_filename(inst_id, name, key):
+    return f"{inst_id:03d}_{re.sub(r'[^0-9A-Za-z_-]+', '_', name).strip('_')}_k{key:03d}.wav"
+
+def render_instrument(task):
+    """
+    Pool worker: renders every key of one instrument into out_dir.
+    task is (inst_id, name, voices, keys, out_dir, hold_ms); each voice is a dict
+    with key_min, key_max, type ('pcm'/'psg'/'noise'), root_key, attack, decay,
+    sustain, release, pan, and wav_path/loop (PCM) or duty (PSG). Keys no voice
+    covers are skipped. Returns (inst_id, [(file name, key)], [error lines]).
+    """
+    inst_id, name, voices, keys, out_dir, hold_ms = task
+    sources = {}
+    written = []
+    errors = []
+    for key in keys:
+        voice = next((v for v in voices if v['key_min'] <= key <= v['key_max']), None)
+        if voice is None: continue
+        source = None
+        if voice['type'] == 'pcm':
+            wav_path = voice['wav_path']
+            if wav_path not in sources:
+                try:
+                    sources[wav_path] = load_source(wav_path)
+                except (OSError, ValueError) as e:
+                    sources[wav_path] = None
+                    errors.append(f"{os.path.basename(wav_path)}: {e}")
+            source = sources[wav_path]
+            if source is None: continue
+
+        stereo = render_note(voice, key, source, hold_ms)
+        filename = preview_filename(inst_id, name, key)
+        write_wav16(os.path.join(out_dir, filename),
+                    np.clip(np.rint(stereo * 32767.0), -32768, 32767).astype(np.int16), PREVIEW_RATE)
+        written.append((filename, key))
+    return inst_id, written, errors
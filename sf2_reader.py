@@ -0,0 +1,265 @@
+"""
+SF2 Reader / Validator
+Memory-maps a SoundFont, indexes its RIFF/LIST chunks and decodes pdta
+records on first access, without reading sample data. validate() checks
+the structure SF2Generator must produce: word-aligned chunks, terminal
+EOP/EOI/EOS records, monotonic bag/generator/modulator indices, zones
+that start with keyRange and end with their instrument/sampleID link,
+loop points inside their sample and 46 zero samples closing smpl.
+
+Usage: python sf2_reader.py FILE.sf2 [...]
+"""
+
+import functools
+import mmap
+import struct
+import sys
+import time
+from collections import namedtuple
+
+CHUNK_HEADER = struct.Struct('<4sI')
+
+PresetHeader = namedtuple('PresetHeader', 'name preset bank bag_index library genre morphology')
+Bag = namedtuple('Bag', 'gen_index mod_index')
+Modulator = namedtuple('Modulator', 'src_oper dest_oper amount amt_src_oper trans_oper')
+Generator = namedtuple('Generator', 'oper amount')
+InstrumentHeader = namedtuple('InstrumentHeader', 'name bag_index')
+SampleHeader = namedtuple('SampleHeader', 'name start end loop_start loop_end sample_rate '
+                                          'original_pitch pitch_correction sample_link sample_type')
+
+# pdta sub-chunks in the order the spec requires: (id, record layout, record type)
+PDTA_LAYOUT = (
+    (b'phdr', struct.Struct('<20sHHHLLL'), PresetHeader),
+    (b'pbag', struct.Struct('<HH'), Bag),
+    (b'pmod', struct.Struct('<HHhHH'), Modulator),
+    (b'pgen', struct.Struct('<Hh'), Generator),
+    (b'inst', struct.Struct('<20sH'), InstrumentHeader),
+    (b'ibag', struct.Struct('<HH'), Bag),
+    (b'imod', struct.Struct('<HHhHH'), Modulator),
+    (b'igen', struct.Struct('<Hh'), Generator),
+    (b'shdr', struct.Struct('<20sIIIIIBbHH'), SampleHeader),
+)
+RECORD_LAYOUT = {chunk_id: (layout, record) for chunk_id, layout, record in PDTA_LAYOUT}
+
+GEN_KEY_RANGE = 43
+GEN_INSTRUMENT = 41
+GEN_SAMPLE_ID = 53
+SAMPLE_PADDING = 46  # zero samples required after sample data
+
+def _name(raw):
+    return raw.split(b'\0', 1)[0].decode('ascii', 'replace')
+
+class SF2File:
+    """Read-only, lazily decoded view of an SF2. Use as a context manager so the mapping is released."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lists = {}        # LIST type -> {chunk id: (data offset, size)}
+        self.odd_chunks = []   # chunk ids with an odd size, which breaks the word alignment
+        self.riff_size = 0
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index_chunks()
+        except Exception:
+            self.close()
+            raise
+
+    def _index_chunks(self):
+        buf = self._map
+        if len(buf) < 12 or buf[0:4] != b'RIFF' or buf[8:12] != b'sfbk':
+            raise ValueError("Not a RIFF/sfbk file")
+        self.riff_size = struct.unpack_from('<I', buf, 4)[0]
+
+        end = min(len(buf), self.riff_size + 8)
+        pos = 12
+        while pos + CHUNK_HEADER.size <= end:
+            chunk_id, size = CHUNK_HEADER.unpack_from(buf, pos)
+            start = pos + CHUNK_HEADER.size
+            if size % 2: self.odd_chunks.append(chunk_id)
+            if chunk_id == b'LIST' and size >= 4:
+                list_type = bytes(buf[start:start + 4])
+                self.lists[list_type] = self._index_list(start + 4, min(start + size, end))
+            pos = start + size + (size % 2)
+
+    def _index_list(self, pos, end):
+        chunks = {}
+        while pos + CHUNK_HEADER.size <= end:
+            chunk_id, size = CHUNK_HEADER.unpack_from(self._map, pos)
+            chunks[chunk_id] = (pos + CHUNK_HEADER.size, size)
+            if size % 2: self.odd_chunks.append(chunk_id)
+            pos += CHUNK_HEADER.size + size + (size % 2)
+        return chunks
+
+    def chunk(self, list_type, chunk_id):
+        """memoryview of a sub-chunk's data, or None if it is missing."""
+        entry = self.lists.get(list_type, {}).get(chunk_id)
+        if entry is None:
+            return None
+        start, size = entry
+        return memoryview(self._map)[start:start + size]
+
+    def _records(self, chunk_id):
+        layout, record = RECORD_LAYOUT[chunk_id]
+        data = self.chunk(b'pdta', chunk_id)
+        if data is None:
+            return []
+        with data:
+            usable = len(data) - len(data) % layout.size
+            return [record._make(fields) for fields in layout.iter_unpack(data[:usable])]
+
+    # Record tables are decoded on first use
+    presets = functools.cached_property(lambda self: self._records(b'phdr'))
+    preset_bags = functools.cached_property(lambda self: self._records(b'pbag'))
+    preset_mods = functools.cached_property(lambda self: self._records(b'pmod'))
+    preset_gens = functools.cached_property(lambda self: self._records(b'pgen'))
+    instruments = functools.cached_property(lambda self: self._records(b'inst'))
+    instrument_bags = functools.cached_property(lambda self: self._records(b'ibag'))
+    instrument_mods = functools.cached_property(lambda self: self._records(b'imod'))
+    instrument_gens = functools.cached_property(lambda self: self._records(b'igen'))
+    samples = functools.cached_property(lambda self: self._records(b'shdr'))
+
+    @property
+    def sample_frames(self):
+        """Number of 16-bit frames in the smpl chunk."""
+        entry = self.lists.get(b'sdta', {}).get(b'smpl')
+        return entry[1] // 2 if entry else 0
+
+    def sample_data(self, header):
+        """memoryview of one sample's 16-bit PCM (header: a SampleHeader)."""
+        smpl = self.chunk(b'sdta', b'smpl')
+        return smpl[header.start * 2:header.end * 2]
+
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ==========================================
+# VALIDATION
+# ==========================================
+def _check_terminal(problems, records, chunk_id, name):
+    if not records:
+        problems.append(f"{chunk_id}: no records (needs at least the terminal '{name}')")
+    elif _name(records[-1].name) != name:
+        problems.append(f"{chunk_id}: last record is '{_name(records[-1].name)}', expected '{name}'")
+
+def _check_indices(problems, label, indices, limit):
+    """indices must never decrease, and the terminal one must equal limit (the record count - 1)."""
+    previous = 0
+    for i, value in enumerate(indices):
+        if value < previous:
+            problems.append(f"{label}[{i}]: index {value} goes backwards (previous {previous})")
+            return
+        previous = value
+    if indices and indices[-1] != limit:
+        problems.append(f"{label}: terminal index {indices[-1]}, expected {limit}")
+
+def _check_zones(problems, label, headers, bags, gens, mods, link_gen, link_limit):
+    _check_indices(problems, f"{label} bag index", [h.bag_index for h in headers], len(bags) - 1)
+    _check_indices(problems, f"{label} generator index", [b.gen_index for b in bags], len(gens) - 1)
+    _check_indices(problems, f"{label} modulator index", [b.mod_index for b in bags], len(mods) - 1)
+
+    # Every zone but a leading global one ends with its link (instrument / sampleID) generator
+    for h, h_next in zip(headers, headers[1:]):
+        zone_ranges = [(bags[z].gen_index, bags[z + 1].gen_index)
+                       for z in range(h.bag_index, min(h_next.bag_index, len(bags) - 1))]
+        for n, (first, last) in enumerate(zone_ranges):
+            zone = gens[first:last]
+            if not zone or zone[-1].oper != link_gen:
+                if n == 0 and all(g.oper != link_gen for g in zone):
+                    continue  # Global zone
+                problems.append(f"{label} '{_name(h.name)}' zone {n}: does not end with generator {link_gen}")
+            elif any(g.oper == GEN_KEY_RANGE for g in zone[1:]):
+                problems.append(f"{label} '{_name(h.name)}' zone {n}: keyRange is not the first generator")
+            elif not 0 <= zone[-1].amount & 0xFFFF < link_limit:
+                problems.append(f"{label} '{_name(h.name)}' zone {n}: link {zone[-1].amount & 0xFFFF} out of range")
+
+def validate(sf2):
+    """Returns a list of problems (empty if the file is consistent). sf2: an SF2File or a path."""
+    if not isinstance(sf2, SF2File):
+        with SF2File(sf2) as opened:
+            return validate(opened)
+
+    problems = [f"{chunk_id.decode('ascii', 'replace')}: odd chunk size (must be padded to even)"
+                for chunk_id in sf2.odd_chunks]
+    if sf2.riff_size + 8 != len(sf2._map):
+        problems.append(f"RIFF size {sf2.riff_size + 8} != file size {len(sf2._map)}")
+    for list_type in (b'INFO', b'sdta', b'pdta'):
+        if list_type not in sf2.lists:
+            problems.append(f"missing LIST {list_type.decode()}")
+    if problems:
+        return problems
+
+    pdta_ids = list(sf2.lists[b'pdta'])
+    expected = [chunk_id for chunk_id, _, _ in PDTA_LAYOUT]
+    if pdta_ids != expected:
+        problems.append(f"pdta chunks {[c.decode() for c in pdta_ids]} != {[c.decode() for c in expected]}")
+    for chunk_id, layout, _ in PDTA_LAYOUT:
+        entry = sf2.lists[b'pdta'].get(chunk_id)
+        if entry and entry[1] % layout.size:
+            problems.append(f"{chunk_id.decode()}: size {entry[1]} is not a multiple of {layout.size}")
+    if problems:
+        return problems
+
+    _check_terminal(problems, sf2.presets, 'phdr', 'EOP')
+    _check_terminal(problems, sf2.instruments, 'inst', 'EOI')
+    _check_terminal(problems, sf2.samples, 'shdr', 'EOS')
+    if problems:
+        return problems
+
+    _check_zones(problems, "preset", sf2.presets, sf2.preset_bags, sf2.preset_gens, sf2.preset_mods,
+                 GEN_INSTRUMENT, len(sf2.instruments) - 1)
+    _check_zones(problems, "instrument", sf2.instruments, sf2.instrument_bags, sf2.instrument_gens,
+                 sf2.instrument_mods, GEN_SAMPLE_ID, len(sf2.samples) - 1)
+
+    # Sample headers: inside the smpl chunk, loops inside their sample
+    frames = sf2.sample_frames
+    data_end = 0
+    for i, s in enumerate(sf2.samples[:-1]):
+        name = _name(s.name)
+        if not s.start < s.end <= frames:
+            problems.append(f"shdr[{i}] '{name}': range {s.start}-{s.end} outside smpl ({frames} frames)")
+        if not s.start <= s.loop_start < s.loop_end <= s.end:
+            problems.append(f"shdr[{i}] '{name}': loop {s.loop_start}-{s.loop_end} outside sample {s.start}-{s.end}")
+        data_end = max(data_end, s.end)
+
+    # Padding after the last sample
+    if frames < data_end + SAMPLE_PADDING:
+        problems.append(f"smpl: {frames - data_end} frames after the last sample, need {SAMPLE_PADDING} zero frames")
+    else:
+        with sf2.chunk(b'sdta', b'smpl') as smpl:
+            padding = smpl[data_end * 2:(data_end + SAMPLE_PADDING) * 2]
+            if any(padding):
+                problems.append(f"smpl: the {SAMPLE_PADDING} frames after the last sample are not all zero")
+    return problems
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("Usage: python sf2_reader.py FILE.sf2 [...]")
+        return 1
+    failed = 0
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            with SF2File(path) as sf2:
+                problems = validate(sf2)
+                summary = (f"{max(0, len(sf2.presets) - 1)} presets, {max(0, len(sf2.instruments) - 1)} instruments, "
+                           f"{max(0, len(sf2.samples) - 1)} samples, {len(sf2._map) / 1e6:.1f} MB")
+        except (OSError, ValueError) as e:
+            problems, summary = [str(e)], "unreadable"
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"[{'OK' if not problems else 'FAILED'}] {path} ({summary}) in {elapsed:.1f} ms")
+        for problem in problems:
+            print(f"    - {problem}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+RIFF/WAVE Reader
+Single-pass chunk walker over a memory-mapped WAV file.
+Locates 'fmt ', 'data' and 'smpl' in one scan and exposes the PCM payload
+as a memoryview, so callers can hash or write it without copying.
+to_mono16() converts any supported layout to 16-bit mono with NumPy, which
+is only imported when it is called; write_wav16() writes 16-bit WAVs.
+"""
+
+import mmap
+import struct
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+CHUNK_HEADER = struct.Struct('<4sI')
+FMT_STRUCT = struct.Struct('<HHIIHH')
+SMPL_LOOP_COUNT_OFFSET = 28
+SMPL_LOOPS_OFFSET = 36
+SMPL_LOOP_STRUCT = struct.Struct('<IIIIII')  # cue id, type, start, end, fraction, play count
+
+def is_pcm16_mono(wav):
+    """True if wav.data already is what an SF2 stores, so it can be copied as is."""
+    return wav.format_tag == WAVE_FORMAT_PCM and wav.bits_per_sample == 16 and wav.channels == 1
+
+def is_supported(wav):
+    """True if to_mono16() can decode this layout."""
+    width = wav.bits_per_sample // 8
+    if wav.channels < 1 or wav.bits_per_sample % 8 or wav.block_align != width * wav.channels:
+        return False
+    if wav.format_tag == WAVE_FORMAT_PCM:
+        return width in (1, 2, 3, 4)
+    return wav.format_tag == WAVE_FORMAT_IEEE_FLOAT and width in (4, 8)
+
+def sanitize_loop(loop, n_frames):
+    """
+    Clamps a (start, end) loop to the sample: an end of 0 or past the data
+    becomes the last frame, and a start at/after the end becomes 0.
+    """
+    loop_start, loop_end = loop
+    if loop_end == 0 or loop_end >= n_frames:
+        loop_end = n_frames - 1
+    if loop_start >= loop_end:
+        loop_start = 0
+    return loop_start, loop_end
+
+class WavFile:
+    """Read-only view of a WAV file. Use as a context manager so the mapping is released."""
+
+    def __init__(self, path):
+        self.path = path
+        self.format_tag = 0
+        self.channels = 0
+        self.sample_rate = 0
+        self.block_align = 0
+        self.bits_per_sample = 0
+        self.loops = []  # [(start, end), ...] in frames, from the 'smpl' chunk
+        self.data = memoryview(b'')
+
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._walk_chunks()
+        except Exception:
+            self.close()
+            raise
+
+    def _walk_chunks(self):
+        buf = self._map
+        if len(buf) < 12 or buf[0:4] != b'RIFF' or buf[8:12] != b'WAVE':
+            raise ValueError("Not a RIFF/WAVE file")
+
+        riff_end = min(len(buf), struct.unpack_from('<I', buf, 4)[0] + 8)
+        found_fmt = False
+        data_range = None
+        pos = 12
+        while pos + CHUNK_HEADER.size <= riff_end:
+            chunk_id, chunk_size = CHUNK_HEADER.unpack_from(buf, pos)
+            start = pos + CHUNK_HEADER.size
+            end = min(start + chunk_size, len(buf))
+
+            if chunk_id == b'fmt ' and end - start >= FMT_STRUCT.size:
+                (self.format_tag, self.channels, self.sample_rate, _,
+                 self.block_align, self.bits_per_sample) = FMT_STRUCT.unpack_from(buf, start)
+                # WAVE_FORMAT_EXTENSIBLE keeps the real format in the SubFormat GUID
+                if self.format_tag == WAVE_FORMAT_EXTENSIBLE and end - start >= 26:
+                    self.format_tag = struct.unpack_from('<H', buf, start + 24)[0]
+                found_fmt = True
+            elif chunk_id == b'data' and data_range is None:
+                data_range = (start, end)
+            elif chunk_id == b'smpl' and not self.loops and end - start >= SMPL_LOOPS_OFFSET:
+                num_loops = struct.unpack_from('<I', buf, start + SMPL_LOOP_COUNT_OFFSET)[0]
+                loop_pos = start + SMPL_LOOPS_OFFSET
+                for _ in range(num_loops):
+                    if loop_pos + SMPL_LOOP_STRUCT.size > end: break
+                    _, _, loop_start, loop_end, _, _ = SMPL_LOOP_STRUCT.unpack_from(buf, loop_pos)
+                    self.loops.append((loop_start, loop_end))
+                    loop_pos += SMPL_LOOP_STRUCT.size
+
+            # Chunks are word aligned
+            pos = start + chunk_size + (chunk_size % 2)
+
+        if not found_fmt:
+            raise ValueError("Missing 'fmt ' chunk")
+        if data_range is None:
+            raise ValueError("Missing 'data' chunk")
+        self.data = memoryview(self._map)[data_range[0]:data_range[1]]
+
+    @property
+    def n_frames(self):
+        return len(self.data) // self.block_align if self.block_align else 0
+
+    def close(self):
+        self.data.release()
+        if not self._map.closed:
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def to_mono16(wav):
+    """
+    Decodes wav.data (8/16/24/32-bit PCM or 32/64-bit float, any channel count)
+    to a NumPy int16 array of mono frames. Channels are averaged.
+    """
+    import numpy as np
+
+    if not is_supported(wav):
+        raise ValueError(f"Unsupported format 0x{wav.format_tag:04X}, {wav.bits_per_sample}-bit, {wav.channels} ch")
+    width = wav.bits_per_sample // 8
+    raw = wav.data[:wav.n_frames * wav.block_align]
+
+    if wav.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        frames = np.frombuffer(raw, dtype='<f%d' % width).astype(np.float64) * 32767.0
+    elif width == 1:
+        frames = (np.frombuffer(raw, dtype=np.uint8).astype(np.int32) - 128) << 8
+    elif width == 2:
+        frames = np.frombuffer(raw, dtype='<i2')
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        # Place the 24-bit value in the top of an int32 so the shift sign-extends it
+        frames = ((b[:, 0] << 8) | (b[:, 1] << 16) | (b[:, 2] << 24)) >> 16
+    else:
+        frames = np.frombuffer(raw, dtype='<i4') >> 16
+
+    if wav.channels > 1:
+        frames = frames.reshape(-1, wav.channels).mean(axis=1)
+    if frames.dtype.kind == 'f':
+        frames = np.rint(frames)
+    elif frames.dtype == np.int16:
+        return frames.copy()  # The source buffer is the file mapping, which close() releases
+    return np.clip(frames, -32768, 32767).astype(np.int16)
+
+def write_wav16(path, frames, sample_rate, loop=None):
+    """
+    Writes int16 frames (mono, or (n, channels) for interleaved) as a PCM WAV,
+    with a forward 'smpl' loop if loop is given.
+    """
+    channels = frames.shape[1] if frames.ndim == 2 else 1
+    data = frames.astype('<i2').tobytes()
+    chunks = b'fmt ' + struct.pack('<I', FMT_STRUCT.size) + FMT_STRUCT.pack(
+        WAVE_FORMAT_PCM, channels, sample_rate, sample_rate * 2 * channels, 2 * channels, 16)
+    chunks += CHUNK_HEADER.pack(b'data', len(data)) + data
+    if len(data) % 2:
+        chunks += b'\0'
+    if loop is not None:
+        # manufacturer, product, period (ns), unity note, pitch fraction, SMPTE format/offset, loop count, extra
+        smpl = struct.pack('<9I', 0, 0, 1000000000 // sample_rate, 60, 0, 0, 0, 1, 0)
+        smpl += SMPL_LOOP_STRUCT.pack(0, 0, loop[0], loop[1], 0, 0)
+        chunks += CHUNK_HEADER.pack(b'smpl', len(smpl)) + smpl
+    with open(path, 'wb') as f:
+        f.write(CHUNK_HEADER.pack(b'RIFF', 4 + len(chunks)) + b'WAVE' + chunks)
@@ -1,3 +0,0 @@
-Get-ChildItem -Filter *.wav | ForEach-Object {
-    .\waveconv.exe -a $_.FullName -o "$($_.BaseName).swav" -v
-}